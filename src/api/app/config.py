@@ -1,45 +1,79 @@
+from functools import lru_cache
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
-# Load environment variables from .env file (override any existing values)
+# Load environment variables from .env file (override any existing values).
+# nano-graphrag reads some provider variables (e.g. AZURE_OPENAI_API_VERSION)
+# straight from os.environ, so the file is loaded into the process environment
+# once here and Settings reads from that rather than parsing .env again.
 load_dotenv(override=True)
 
-class Settings:
+class Settings(BaseSettings):
+    # Field names map to upper-case environment variables (DATA_ROOT, LOG_LEVEL, ...).
+    # Frozen: values are read once at startup and never mutated afterwards.
+    model_config = SettingsConfigDict(frozen=True, extra="ignore")
+
     # Simple hardcoded defaults for local development
-    data_root: Path = Path(os.getenv("DATA_ROOT", "./data"))
-    log_level: str = os.getenv("LOG_LEVEL", "INFO")
-    database_url: str = os.getenv("DATABASE_URL", "sqlite:///./dashrag.db")
-    
-    max_upload_mb: int = int(os.getenv("MAX_UPLOAD_MB", "100"))
-    arxiv_max_results: int = int(os.getenv("ARXIV_MAX_RESULTS", "10"))
-    
+    data_root: Path = Path("./data")
+    log_level: str = "INFO"
+    database_url: str = "sqlite:///./dashrag.db"
+
+    max_upload_mb: int = 100
+    # Longest error log stored on a document row; longer tracebacks go to a file.
+    insert_log_max_bytes: int = 4096
+    arxiv_max_results: int = 10
+
     # Auth settings
-    jwt_secret_key: str = os.getenv("JWT_SECRET_KEY", "change-me-in-production")
+    jwt_secret_key: str = "change-me-in-production"
     jwt_algorithm: str = "HS256"
-    access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
-    
+    access_token_expire_minutes: int = 1440
+
     # CORS allowed origins (comma-separated). Defaults include localhost dev + Vercel deployment.
-    cors_origins: list[str] = [
-        o.strip()
-        for o in os.getenv("CORS_ORIGINS", "http://localhost:3000,https://dashrag.vercel.app").split(",")
-        if o.strip()
-    ]
+    cors_origins_csv: str = Field(
+        "http://localhost:3000,https://dashrag.vercel.app",
+        validation_alias="CORS_ORIGINS",
+    )
 
     # Maximum seconds a GraphRAG query may run before being cancelled.
-    query_timeout_seconds: int = int(os.getenv("QUERY_TIMEOUT_SECONDS", "180"))
+    query_timeout_seconds: int = 180
+
+    # Documents for the same session that finish extraction within this window
+    # are inserted into the knowledge graph as a single batch.
+    ingest_batch_size: int = 8
+    ingest_max_wait_ms: int = 100
+
+    # Threads dedicated to document processing (extraction, download, graph insert),
+    # kept separate from the request threadpool.
+    ingest_workers: int = 4
+
+    # Loaded GraphRAG instances kept in memory across requests (LRU).
+    rag_cache_size: int = 128
 
     # Optional features - set to None by default
     ngr_use_gemini: bool | None = None
     ngr_use_azure_openai: bool | None = None
-    
+
     # API Keys (these will be available as environment variables for nano-graphrag)
-    gemini_api_key: str = os.getenv("GEMINI_API_KEY", "")
-    openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
-    azure_openai_api_key: str = os.getenv("AZURE_OPENAI_API_KEY", "")
-    azure_openai_endpoint: str = os.getenv("AZURE_OPENAI_ENDPOINT", "")
+    gemini_api_key: str = ""
+    google_api_key: str = ""
+    openai_api_key: str = ""
+    azure_openai_api_key: str = ""
+    azure_openai_endpoint: str = ""
+
+    @property
+    def cors_origins(self) -> list[str]:
+        return [o.strip() for o in self.cors_origins_csv.split(",") if o.strip()]
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
 
-settings = Settings()
+settings = get_settings()
 settings.data_root.mkdir(parents=True, exist_ok=True)
 
 # Ensure API keys are set in environment for nano-graphrag to find
@@ -50,4 +84,4 @@ if settings.openai_api_key:
 if settings.azure_openai_api_key:
     os.environ["AZURE_OPENAI_API_KEY"] = settings.azure_openai_api_key
 if settings.azure_openai_endpoint:
-    os.environ["AZURE_OPENAI_ENDPOINT"] = settings.azure_openai_endpoint
\ No newline at end of file
+    os.environ["AZURE_OPENAI_ENDPOINT"] = settings.azure_openai_endpoint
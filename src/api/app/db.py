@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import logging
+from pathlib import Path
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker, DeclarativeBase, raiseload
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 class Base(DeclarativeBase):
     pass
 
@@ -18,13 +23,97 @@ _engine_kwargs: dict = {"connect_args": {"check_same_thread": False}} if _is_sql
 }
 
 engine = create_engine(settings.database_url, **_engine_kwargs)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+if _is_sqlite:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _record):
+        # PRAGMAs are per connection, so apply them to every new pooled one.
+        # WAL lets the list/poll endpoints read while a background task writes,
+        # and synchronous=NORMAL drops the fsync on every commit (WAL is still
+        # crash-safe; only the last transactions before a power loss can be lost).
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA foreign_keys=ON")
+        cur.execute("PRAGMA busy_timeout=5000")
+        cur.close()
+
+# expire_on_commit=False: handlers build their responses from the objects they
+# just wrote, and expiring them would cost a SELECT per attribute access after
+# commit. Code that needs another writer's changes opens a fresh session.
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+
+
+def _read_only_engine():
+    """Engine for read-only request handlers.
+
+    For a file-backed SQLite database this opens the file with mode=ro in its own
+    pool, so list/status reads never take the write connections' locks and cannot
+    write by accident. Other databases (and in-memory SQLite) share the main engine.
+    """
+    url = make_url(settings.database_url)
+    if not _is_sqlite or url.database in (None, "", ":memory:"):
+        return engine
+    path = Path(url.database).resolve().as_posix()
+    ro = create_engine(
+        f"sqlite:///file:{path}?mode=ro&uri=true",
+        connect_args={"check_same_thread": False},
+        pool_size=8,
+        max_overflow=8,
+    )
+
+    @event.listens_for(ro, "connect")
+    def _set_ro_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA busy_timeout=5000")
+        cur.close()
+
+    return ro
+
+
+ReadSessionLocal = sessionmaker(bind=_read_only_engine(), autocommit=False, autoflush=False)
+
+# Loader options for single-row fetches: any relationship traversal on the
+# result raises instead of silently issuing a lazy SELECT per access.
+NO_LAZY = (raiseload("*"),)
 
 def init_db():
     """Initialize database tables. Call this after all models are imported."""
     from . import models  # noqa: F401
     Base.metadata.create_all(bind=engine)
+    _ensure_columns()
     _ensure_indexes()
+    _ensure_unique_indexes()
+    _ensure_jsonb()
+
+
+# (table, column, DDL type) for columns added after the first deployments.
+_COLUMNS = [
+    ("documents", "sha256", "VARCHAR(64)"),
+]
+
+
+def _ensure_columns():
+    """Add nullable columns that create_all() will not add to existing tables."""
+    from sqlalchemy import inspect, text
+    insp = inspect(engine)
+    tables = set(insp.get_table_names())
+    with engine.connect() as conn:
+        for table, column, ddl_type in _COLUMNS:
+            if table not in tables:
+                continue
+            if column not in {c["name"] for c in insp.get_columns(table)}:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+        conn.commit()
+
+
+# (table, index name, columns) for indexes added after the first deployments.
+_INDEXES = [
+    ("messages", "ix_messages_session_created", "session_id, created_at"),
+    ("documents", "ix_documents_session_status", "session_id, status"),
+    ("documents", "ix_documents_session_created", "session_id, created_at DESC"),
+    ("documents", "ix_documents_session_sha256", "session_id, sha256"),
+]
 
 
 def _ensure_indexes():
@@ -36,19 +125,77 @@ def _ensure_indexes():
     """
     from sqlalchemy import inspect, text
     insp = inspect(engine)
+    tables = set(insp.get_table_names())
     with engine.connect() as conn:
-        if "messages" in insp.get_table_names():
-            existing = {i["name"] for i in insp.get_indexes("messages")}
-            if "ix_messages_session_created" not in existing:
-                conn.execute(text(
-                    "CREATE INDEX IF NOT EXISTS ix_messages_session_created "
-                    "ON messages (session_id, created_at)"
-                ))
-        if "documents" in insp.get_table_names():
-            existing = {i["name"] for i in insp.get_indexes("documents")}
-            if "ix_documents_session_status" not in existing:
+        for table, name, columns in _INDEXES:
+            if table not in tables:
+                continue
+            existing = {i["name"] for i in insp.get_indexes(table)}
+            if name not in existing:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+        conn.commit()
+
+
+# (table, index name, columns, superseded index) for unique indexes added later.
+_UNIQUE_INDEXES = [
+    ("documents", "ux_documents_session_arxiv", "session_id, arxiv_id", "ix_documents_session_arxiv"),
+]
+
+
+def _ensure_unique_indexes():
+    """Create unique indexes on existing tables and drop the plain ones they replace.
+
+    If existing rows already violate the constraint the index is skipped with a
+    warning (the superseded plain index is kept), so startup never fails on
+    legacy data; remove the duplicates and restart to pick it up.
+    """
+    from sqlalchemy import inspect, text
+    from sqlalchemy.exc import IntegrityError
+    insp = inspect(engine)
+    tables = set(insp.get_table_names())
+    for table, name, columns, replaces in _UNIQUE_INDEXES:
+        if table not in tables:
+            continue
+        existing = {i["name"] for i in insp.get_indexes(table)}
+        with engine.connect() as conn:
+            try:
+                if name not in existing:
+                    conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+                if replaces in existing:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {replaces}"))
+                conn.commit()
+            except IntegrityError:
+                conn.rollback()
+                logger.warning(f"Duplicate ({columns}) rows in {table}; unique index {name} not created")
+
+
+# (table, column) pairs stored as jsonb on PostgreSQL.
+_JSONB_COLUMNS = [("messages", "content"), ("sessions", "settings")]
+
+
+def _ensure_jsonb():
+    """Convert JSON columns created as ``json`` by older deployments to ``jsonb``.
+
+    PostgreSQL only. The conversion rewrites the table once; afterwards the
+    column type check makes this a no-op.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    from sqlalchemy import inspect, text
+    from sqlalchemy.dialects.postgresql import JSONB
+    insp = inspect(engine)
+    tables = set(insp.get_table_names())
+    with engine.connect() as conn:
+        for table, column in _JSONB_COLUMNS:
+            if table not in tables:
+                continue
+            col = next((c for c in insp.get_columns(table) if c["name"] == column), None)
+            if col is not None and not isinstance(col["type"], JSONB):
                 conn.execute(text(
-                    "CREATE INDEX IF NOT EXISTS ix_documents_session_status "
-                    "ON documents (session_id, status)"
+                    f"ALTER TABLE {table} ALTER COLUMN {column} TYPE jsonb USING {column}::jsonb"
                 ))
+        if "messages" in tables:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_messages_content_gin ON messages USING gin (content)"
+            ))
         conn.commit()
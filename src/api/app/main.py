@@ -1,10 +1,19 @@
 import logging
 import sys
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from .db import Base, engine, init_db
 from .routers import sessions, documents, messages, papers, health, auth
+from .services.ingest_queue import shutdown_ingest_queue
 from .config import settings
+from .utils.arxiv_utils import close_http_client
+from .utils.compression import SelectiveGZipMiddleware
+from .utils.content_size import ContentSizeLimitMiddleware
+from .utils.pdf_utils import shutdown_extract_pool
+from .utils.trash import sweep_trash
 
 # Configure logging
 logging.basicConfig(
@@ -26,6 +35,17 @@ logger.info(f"Starting DashRAG API with log level: {settings.log_level}")
 # Initialize database with all models
 init_db()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Finish session deletions interrupted by a restart, without delaying startup
+    threading.Thread(target=sweep_trash, args=(settings.data_root / "sessions",), daemon=True).start()
+    yield
+    shutdown_ingest_queue()
+    shutdown_extract_pool()
+    close_http_client()
+
+
 app = FastAPI(
     title="DashRAG Chat API",
     description="""
@@ -62,8 +82,14 @@ Currently open (no auth). Add your own auth middleware for production.
     license_info={
         "name": "MIT",
     },
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
+# Cap request bodies at the upload limit plus room for multipart framing. Added
+# before CORS so 413 responses still carry CORS headers.
+app.add_middleware(ContentSizeLimitMiddleware, max_bytes=(settings.max_upload_mb + 1) * 1024 * 1024)
+
 # Origins loaded from CORS_ORIGINS env var (comma-separated); see config.py for defaults.
 app.add_middleware(
     CORSMiddleware,
@@ -73,6 +99,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON bodies (document lists, arXiv abstracts) over 1 KiB.
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024, compresslevel=5)
+
 app.include_router(health.router)
 app.include_router(auth.router)
 app.include_router(sessions.router)
@@ -1,10 +1,14 @@
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, Enum, ForeignKey, JSON, Text, Integer, Index
+from sqlalchemy import String, DateTime, Enum, ForeignKey, JSON, Text, Integer, Index, desc
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 import enum
 
 from .db import Base
 
+# Binary jsonb on PostgreSQL (parsed once on write, GIN-indexable); plain JSON elsewhere.
+JSONDoc = JSON().with_variant(JSONB(), "postgresql")
+
 class DocSource(str, enum.Enum):
     upload = "upload"
     arxiv = "arxiv"
@@ -45,7 +49,7 @@ class Session(Base):
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
     title: Mapped[str] = mapped_column(String, nullable=False)
     graph_dir: Mapped[str] = mapped_column(String, nullable=False)
-    settings: Mapped[dict] = mapped_column(JSON, default=dict)
+    settings: Mapped[dict] = mapped_column(JSONDoc, default=dict)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(timezone.utc))
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(timezone.utc))
 
@@ -70,6 +74,7 @@ class Document(Base):
     insert_log: Mapped[str | None] = mapped_column(Text, nullable=True)
     pages: Mapped[int | None] = mapped_column(Integer, nullable=True)
     tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(timezone.utc))
 
     session = relationship("Session", back_populates="documents")
@@ -77,6 +82,12 @@ class Document(Base):
     __table_args__ = (
         # Speeds up listing & status-filtering documents within a session
         Index("ix_documents_session_status", "session_id", "status"),
+        # One row per paper per session; add-arxiv upserts against it
+        Index("ux_documents_session_arxiv", "session_id", "arxiv_id", unique=True),
+        # Serves list_docs' newest-first ordering straight from the index
+        Index("ix_documents_session_created", "session_id", desc("created_at")),
+        # Finds an identical upload already in the session
+        Index("ix_documents_session_sha256", "session_id", "sha256"),
     )
 
 class Message(Base):
@@ -84,7 +95,7 @@ class Message(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     session_id: Mapped[int] = mapped_column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"), index=True)
     role: Mapped[Role] = mapped_column(Enum(Role), nullable=False)
-    content: Mapped[dict] = mapped_column(JSON, nullable=False)
+    content: Mapped[dict] = mapped_column(JSONDoc, nullable=False)
     token_usage: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(timezone.utc))
 
@@ -93,4 +104,6 @@ class Message(Base):
     __table_args__ = (
         # Speeds up fetching conversation history ordered by time within a session
         Index("ix_messages_session_created", "session_id", "created_at"),
+        # Containment queries over message content (PostgreSQL only)
+        Index("ix_messages_content_gin", "content", postgresql_using="gin").ddl_if(dialect="postgresql"),
     )
@@ -5,7 +5,7 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
 
-from ..db import SessionLocal
+from ..db import SessionLocal, NO_LAZY
 from ..models import User
 from ..config import settings
 
@@ -38,7 +38,7 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: DBSession = Depend
     except (TypeError, ValueError):
         raise credentials_exception
     
-    user = db.get(User, user_id)
+    user = db.get(User, user_id, options=NO_LAZY)
     if user is None:
         raise credentials_exception
     return user
@@ -56,7 +56,6 @@ def register(payload: dict, db: DBSession = Depends(get_db)):
     user = User(email=email, hashed_password=pwd_context.hash(password))
     db.add(user)
     db.commit()
-    db.refresh(user)
     return {"id": user.id, "email": user.email}
 
 @router.post("/token")
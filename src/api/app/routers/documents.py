@@ -1,27 +1,34 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session as DBSession
 from pathlib import Path
 import logging
-import traceback
 import asyncio
-import json
+import hashlib
 import os
 import time
+import uuid
+import aiofiles
 
-from ..db import SessionLocal
+from ..db import SessionLocal, ReadSessionLocal, NO_LAZY
 from ..models import Session as SessionModel, Document, DocSource, DocStatus, User
-from ..utils.pdf_utils import extract_text
-from ..utils.arxiv_utils import search_arxiv, download_pdf
+from ..schemas import AddArxivRequest, DocSummary
+from ..utils.arxiv_utils import search_arxiv_cached, download_pdf
 from ..services.graphrag_service import DashRAGService
 from ..services.background_tasks import process_uploaded_document, process_arxiv_document
+from ..services.ingest_queue import enqueue_job
 from ..services.eta_estimator import estimate_index_total_ms, estimate_remaining_ms
-from ..utils.locks import session_lock
+from ..utils.sse import sse_event, sse_response
 from ..config import settings
 from .auth import get_current_user
 
 logger = logging.getLogger(__name__)
 
+UPLOAD_CHUNK_BYTES = 1 << 20  # 1 MiB
+
 router = APIRouter(
     prefix="/documents", 
     tags=["documents"],
@@ -35,6 +42,14 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """Session on the read-only pool, for handlers that never write."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def _session_root(sid: int) -> Path:
     return settings.data_root / "sessions" / str(sid)
 def _uploads_dir(sid: int) -> Path:
@@ -44,9 +59,36 @@ def _lock_file(sid: int) -> Path:
 def _graph_dir(sid: int) -> Path:
     return _session_root(sid) / "graph"
 
+def _load_document(doc_id: int) -> Document | None:
+    """Load a document in a short-lived session (used by polling loops)."""
+    local_db = ReadSessionLocal()
+    try:
+        return local_db.get(Document, doc_id, options=NO_LAZY)
+    finally:
+        local_db.close()
+
+def _find_session_upload(db: DBSession, sid: int, sha256: str):
+    """Return (id, status, title) of a non-failed document in the session with the given content hash."""
+    return db.query(Document.id, Document.status, Document.title).filter(
+        Document.session_id == sid,
+        Document.sha256 == sha256,
+        Document.status != DocStatus.error,
+    ).first()
+
+def _insert_arxiv_document(db: DBSession, sid: int, arxiv_id: str) -> int | None:
+    """Insert a pending arXiv document, or return None if the session already has that paper."""
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = (
+        insert(Document)
+        .values(session_id=sid, source_type=DocSource.arxiv, status=DocStatus.pending, arxiv_id=arxiv_id)
+        .on_conflict_do_nothing()
+        .returning(Document.id)
+    )
+    return db.execute(stmt).scalar_one_or_none()
+
 def get_user_session(sid: int, user: User, db: DBSession) -> SessionModel:
     """Helper to get a session and verify ownership"""
-    s = db.get(SessionModel, sid)
+    s = db.get(SessionModel, sid, options=NO_LAZY)
     if not s:
         raise HTTPException(404, "Session not found")
     if s.user_id != user.id:
@@ -55,7 +97,7 @@ def get_user_session(sid: int, user: User, db: DBSession) -> SessionModel:
 
 @router.get(
     "", 
-    response_model=list[dict],
+    response_model=list[DocSummary],
     summary="List documents in session",
     description="""
     Retrieve all documents added to a session.
@@ -100,18 +142,25 @@ def get_user_session(sid: int, user: User, db: DBSession) -> SessionModel:
         }
     }
 )
-def list_docs(sid: int = Query(..., description="Session ID"), user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
+async def list_docs(sid: int = Query(..., description="Session ID"), user: User = Depends(get_current_user), db: DBSession = Depends(get_read_db)):
     """List all documents in a session"""
-    get_user_session(sid, user, db)
-    docs = db.query(Document).filter(Document.session_id==sid).order_by(Document.created_at.desc()).all()
-    return [{
-        "id": d.id, "title": d.title, "source_type": d.source_type.value,
-        "status": d.status.value, "arxiv_id": d.arxiv_id, "pages": d.pages
-    } for d in docs]
+    def load():
+        get_user_session(sid, user, db)
+        # Select only the listed columns so large TEXT fields (insert_log, authors)
+        # are never read or hydrated into ORM objects.
+        return db.execute(
+            select(Document.id, Document.title, Document.source_type, Document.status, Document.arxiv_id, Document.pages)
+            .where(Document.session_id == sid)
+            .order_by(Document.created_at.desc())
+        ).all()
+
+    # Only the query borrows a worker thread; response serialization stays on the loop.
+    # Rows are validated straight into DocSummary (from_attributes), no dict copy.
+    return await run_in_threadpool(load)
 
 @router.post(
     "/upload", 
-    response_model=dict,
+    response_model=None,
     status_code=202,
     summary="Upload PDF document",
     description="""
@@ -119,22 +168,26 @@ def list_docs(sid: int = Query(..., description="Session ID"), user: User = Depe
     
     **Process:**
     1. File is saved to session's uploads directory
-    2. Document record created with status `inserting`
+    2. Document record created with status `pending`
     3. 202 Accepted response returned immediately
     4. Background processing:
        - Text extracted from PDF
        - Entities and relationships extracted
        - Knowledge graph updated
-       - Status changes: `inserting` → `ready` (or `error`)
+       - Status changes: `pending` → `inserting` → `ready` (or `error`)
     
     **Request:** Multipart form-data with `file` field
     
     **Accepts:** PDF files only (`.pdf` extension)
     
+    Uploading a file byte-identical to one already in the session (and not in
+    `error`) returns the existing document with `"cached": true` instead of
+    processing it again.
+    
     **Query parameters:**
     - `sid`: Session ID
     
-    **Use GET /documents?sid={sid} to check document status**
+    **Use GET /documents/status?sid={sid}&doc_id={id} to check document status**
     """,
     responses={
         202: {
@@ -143,18 +196,18 @@ def list_docs(sid: int = Query(..., description="Session ID"), user: User = Depe
                 "application/json": {
                     "example": {
                         "id": 1,
-                        "status": "inserting",
+                        "status": "pending",
                         "title": "my_research_paper.pdf"
                     }
                 }
             }
         },
         400: {"description": "Invalid file format (must be PDF)"},
-        404: {"description": "Session not found"}
+        404: {"description": "Session not found"},
+        413: {"description": "File exceeds MAX_UPLOAD_MB"}
     }
 )
 async def upload_pdf(
-    background_tasks: BackgroundTasks,
     sid: int = Query(..., description="Session ID"),
     file: UploadFile = File(...),
     user: User = Depends(get_current_user),
@@ -162,48 +215,82 @@ async def upload_pdf(
 ):
     """Upload a PDF and process it in the background"""
     logger.info(f"Uploading PDF '{file.filename}' to session {sid}")
-    sess = get_user_session(sid, user, db)
+    # This handler stays async for the streamed body; blocking DB calls are
+    # pushed to the threadpool so they don't stall the event loop.
+    sess = await run_in_threadpool(get_user_session, sid, user, db)
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(400, "Only PDF files are supported")
 
     uploads = _uploads_dir(sid)
     uploads.mkdir(parents=True, exist_ok=True)
-    doc = Document(session_id=sid, source_type=DocSource.upload, status=DocStatus.inserting, title=file.filename)
+    doc = Document(session_id=sid, source_type=DocSource.upload, status=DocStatus.pending, title=file.filename)
     db.add(doc)
-    db.commit()
-    db.refresh(doc)
 
+    # Stream into a temporary file first so no write transaction is held open
+    # while the body is still arriving; the record is committed once, after the
+    # file is in place under its final name.
+    tmp_path = uploads / f".upload-{uuid.uuid4().hex}.part"
     try:
-        pdf_path = uploads / f"{doc.id}.pdf"
-        data = await file.read()
-        pdf_path.write_bytes(data)
+        # Stream to disk in fixed-size chunks so memory stays bounded regardless of file size
+        max_bytes = settings.max_upload_mb * 1024 * 1024
+        written = 0
+        hasher = hashlib.sha256()
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise HTTPException(413, f"File exceeds the {settings.max_upload_mb} MB upload limit")
+                hasher.update(chunk)
+                await out.write(chunk)
+
+        digest = hasher.hexdigest()
+        duplicate = await run_in_threadpool(_find_session_upload, db, sid, digest)
+        if duplicate:
+            # Same bytes are already in (or on their way into) this session's graph
+            db.expunge(doc)
+            tmp_path.unlink(missing_ok=True)
+            logger.info(f"PDF '{file.filename}' matches document {duplicate.id} in session {sid}, skipping processing")
+            return {"id": duplicate.id, "status": duplicate.status.value, "title": duplicate.title, "cached": True}
+
+        doc.sha256 = digest
+        await run_in_threadpool(db.flush)  # assigns doc.id
+        doc_id = doc.id
+        pdf_path = uploads / f"{doc_id}.pdf"
+        os.replace(tmp_path, pdf_path)
         doc.local_pdf_path = str(pdf_path)
-        db.commit()
+        await run_in_threadpool(db.commit)
         logger.info(f"PDF saved to {pdf_path}, scheduling background processing")
-        
-        # Schedule background processing
-        background_tasks.add_task(
-            process_uploaded_document,
-            doc_id=doc.id,
-            session_id=sid,
-            pdf_path=pdf_path,
-            graph_dir=_graph_dir(sid),
-            lock_file=_lock_file(sid)
-        )
-        
-        return {"id": doc.id, "status": doc.status.value, "title": doc.title}
-        
+    except HTTPException:
+        # Rejected upload: nothing was committed, just drop the partial file
+        await run_in_threadpool(db.rollback)
+        tmp_path.unlink(missing_ok=True)
+        raise
     except Exception as e:
+        tmp_path.unlink(missing_ok=True)
         error_msg = f"Failed to save PDF: {str(e)}"
-        logger.error(error_msg, exc_info=True)
+        # The full traceback goes to the log only; the row just names the failure.
+        logger.exception(error_msg)
         doc.status = DocStatus.error
-        doc.insert_log = f"{error_msg}\n\nTraceback:\n{traceback.format_exc()}"
-        db.commit()
+        doc.insert_log = f"{type(e).__name__}: {e}"
+        await run_in_threadpool(db.commit)
         raise HTTPException(500, error_msg)
 
+    # Schedule background processing
+    enqueue_job(
+        process_uploaded_document,
+        doc_id=doc_id,
+        session_id=sid,
+        pdf_path=pdf_path,
+        graph_dir=_graph_dir(sid),
+        lock_file=_lock_file(sid)
+    )
+
+    # Values captured before the commit, so the response needs no reload
+    return {"id": doc_id, "status": DocStatus.pending.value, "title": file.filename}
+
 @router.get(
     "/search-arxiv", 
-    response_model=list[dict],
+    response_model=None,
     summary="Search arXiv papers",
     description="""
     Search arXiv without adding documents to the session (preview mode).
@@ -238,28 +325,29 @@ async def upload_pdf(
         }
     }
 )
-def preview_arxiv(sid: int = Query(..., description="Session ID"), query: str = Query(..., description="Search query"), max_results: int = Query(5, description="Maximum number of results"), user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
+def preview_arxiv(response: Response, sid: int = Query(..., description="Session ID"), query: str = Query(..., description="Search query"), max_results: int = Query(5, description="Maximum number of results"), user: User = Depends(get_current_user), db: DBSession = Depends(get_read_db)):
     """Preview arXiv search results without adding documents"""
     get_user_session(sid, user, db)
     max_results = min(max_results, settings.arxiv_max_results)
-    return search_arxiv(query, max_results=max_results)
+    response.headers["Cache-Control"] = "private, max-age=60"
+    return search_arxiv_cached(query, max_results=max_results)
 
 @router.post(
     "/add-arxiv", 
-    response_model=dict,
+    response_model=None,
     status_code=202,
     summary="Add arXiv paper to session",
     description="""
     Download and process an arXiv paper asynchronously.
     
     **Process:**
-    1. Document record created with status `downloading`
+    1. Document record created with status `pending`
     2. 202 Accepted response returned immediately
     3. Background processing:
        - Download PDF from arXiv
        - Extract text
        - Build knowledge graph
-       - Status transitions: `downloading` → `inserting` → `ready` (or `error`)
+       - Status transitions: `pending` → `downloading` → `inserting` → `ready` (or `error`)
     
     **Request body:**
     ```json
@@ -275,7 +363,10 @@ def preview_arxiv(sid: int = Query(..., description="Session ID"), query: str =
     - `1706.03762` (new format)
     - `cs/0703001` (old format)
     
-    **Use GET /documents?sid={sid} to check document status**
+    If the paper is already `ready` in this session, the existing document is
+    returned with `"cached": true` and nothing is downloaded or re-processed.
+    
+    **Use GET /documents/status?sid={sid}&doc_id={id} to check document status**
     """,
     responses={
         202: {
@@ -284,7 +375,7 @@ def preview_arxiv(sid: int = Query(..., description="Session ID"), query: str =
                 "application/json": {
                     "example": {
                         "id": 2,
-                        "status": "downloading",
+                        "status": "pending",
                         "arxiv_id": "1706.03762"
                     }
                 }
@@ -294,32 +385,42 @@ def preview_arxiv(sid: int = Query(..., description="Session ID"), query: str =
         404: {"description": "Session not found or arXiv paper not found"}
     }
 )
-async def add_arxiv(
-    background_tasks: BackgroundTasks,
+def add_arxiv(
+    payload: AddArxivRequest,
     sid: int = Query(..., description="Session ID"),
-    payload: dict = None,
     user: User = Depends(get_current_user),
     db: DBSession = Depends(get_db)
 ):
     """Download and process an arXiv paper in the background"""
     logger.info(f"Adding arXiv paper to session {sid}")
     sess = get_user_session(sid, user, db)
-    arxiv_id = payload.get("arxiv_id")
+    arxiv_id = payload.arxiv_id.strip()
     if not arxiv_id:
         raise HTTPException(400, "arxiv_id is required")
 
     uploads = _uploads_dir(sid)
     uploads.mkdir(parents=True, exist_ok=True)
-    doc = Document(session_id=sid, source_type=DocSource.arxiv, status=DocStatus.downloading, arxiv_id=arxiv_id)
-    db.add(doc)
+    doc_id = _insert_arxiv_document(db, sid, arxiv_id)
+    if doc_id is None:
+        # The paper is already in this session: skip the download and the LLM
+        # extraction entirely, unless the earlier attempt failed.
+        existing = db.query(Document).filter_by(session_id=sid, arxiv_id=arxiv_id).one()
+        if existing.status != DocStatus.error:
+            logger.info(f"arXiv paper {arxiv_id} already in session {sid} as document {existing.id} ({existing.status.value})")
+            return {"id": existing.id, "status": existing.status.value, "arxiv_id": arxiv_id, "cached": True}
+        doc_id = existing.id
+        existing.status = DocStatus.pending
+        existing.processing_phase = None
+        existing.progress_percent = None
+        existing.insert_log = None
+        logger.info(f"Retrying failed arXiv document {doc_id} for paper {arxiv_id}")
     db.commit()
-    db.refresh(doc)
-    logger.info(f"Created document record {doc.id} for arXiv paper {arxiv_id}, scheduling background processing")
+    logger.info(f"Created document record {doc_id} for arXiv paper {arxiv_id}, scheduling background processing")
     
     # Schedule background processing
-    background_tasks.add_task(
+    enqueue_job(
         process_arxiv_document,
-        doc_id=doc.id,
+        doc_id=doc_id,
         session_id=sid,
         arxiv_id=arxiv_id,
         uploads_dir=uploads,
@@ -327,7 +428,62 @@ async def add_arxiv(
         lock_file=_lock_file(sid)
     )
     
-    return {"id": doc.id, "status": doc.status.value, "arxiv_id": arxiv_id}
+    return {"id": doc_id, "status": DocStatus.pending.value, "arxiv_id": arxiv_id}
+
+
+@router.get(
+    "/status",
+    response_model=None,
+    summary="Get document processing status",
+    description="""
+    Lightweight polling endpoint for a single document's processing state.
+
+    Uploads and arXiv additions return `202` immediately with status `pending`;
+    poll this endpoint (or subscribe to `/documents/progress-stream`) until the
+    status reaches `ready` or `error`.
+
+    **Query parameters:**
+    - `sid`: Session ID
+    - `doc_id`: Document ID returned by the upload / add-arxiv call
+    """,
+    responses={
+        200: {
+            "description": "Current document status",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "id": 1,
+                        "status": "inserting",
+                        "processing_phase": "entity_extraction",
+                        "progress_percent": 40,
+                        "pages": 12,
+                        "error": None
+                    }
+                }
+            }
+        },
+        404: {"description": "Session or document not found"}
+    }
+)
+def get_document_status(
+    sid: int = Query(..., description="Session ID"),
+    doc_id: int = Query(..., description="Document ID"),
+    user: User = Depends(get_current_user),
+    db: DBSession = Depends(get_read_db)
+):
+    """Return the current processing status of a document"""
+    get_user_session(sid, user, db)
+    doc = db.get(Document, doc_id, options=NO_LAZY)
+    if not doc or doc.session_id != sid:
+        raise HTTPException(404, "Document not found in session")
+    return {
+        "id": doc.id,
+        "status": doc.status.value,
+        "processing_phase": doc.processing_phase,
+        "progress_percent": doc.progress_percent,
+        "pages": doc.pages,
+        "error": doc.insert_log if doc.status == DocStatus.error else None,
+    }
 
 
 @router.get(
@@ -359,17 +515,17 @@ async def add_arxiv(
         404: {"description": "Session or document not found"}
     }
 )
-async def stream_document_progress(
+def stream_document_progress(
     sid: int = Query(..., description="Session ID"),
     doc_id: int = Query(..., description="Document ID to monitor"),
     user: User = Depends(get_current_user),
-    db: DBSession = Depends(get_db)
+    db: DBSession = Depends(get_read_db)
 ):
     """Stream real-time progress updates for a document"""
     
     get_user_session(sid, user, db)
     
-    doc = db.get(Document, doc_id)
+    doc = db.get(Document, doc_id, options=NO_LAZY)
     if not doc or doc.session_id != sid:
         raise HTTPException(404, "Document not found in session")
 
@@ -392,71 +548,57 @@ async def stream_document_progress(
         # Poll database for changes every 1 second
         while True:
             try:
-                # Create a new database session for each iteration
-                local_db = SessionLocal()
-                try:
-                    local_doc = local_db.get(Document, doc_id)
-                    
-                    if not local_doc:
-                        yield f"data: {json.dumps({'event': 'error', 'message': 'Document not found'})}\n\n"
-                        break
+                local_doc = await run_in_threadpool(_load_document, doc_id)
+                if not local_doc:
+                    yield sse_event({'event': 'error', 'message': 'Document not found'})
+                    break
 
-                    elapsed_ms = int((time.perf_counter() - stream_started) * 1000)
-                    refined_total_ms, remaining_ms = estimate_remaining_ms(
-                        elapsed_ms=elapsed_ms,
-                        progress_percent=local_doc.progress_percent,
-                        initial_total_ms=initial_estimated_total_ms,
-                    )
-
-                    event_data = {
-                        "document_id": local_doc.id,
-                        "status": local_doc.status.value,
-                        "processing_phase": local_doc.processing_phase,
-                        "progress_percent": local_doc.progress_percent,
-                        "elapsed_ms": elapsed_ms,
-                        "estimated_total_ms": refined_total_ms,
-                        "estimated_remaining_ms": remaining_ms,
-                        "completed_in_ms": elapsed_ms if local_doc.status in [DocStatus.ready, DocStatus.error] else None,
-                        "file_size_bytes": file_size_bytes,
-                    }
+                elapsed_ms = int((time.perf_counter() - stream_started) * 1000)
+                refined_total_ms, remaining_ms = estimate_remaining_ms(
+                    elapsed_ms=elapsed_ms,
+                    progress_percent=local_doc.progress_percent,
+                    initial_total_ms=initial_estimated_total_ms,
+                )
 
-                    # Emit every tick while active so elapsed/remaining updates in real time.
-                    should_emit_tick = local_doc.status in [DocStatus.inserting, DocStatus.downloading]
-                    
-                    # Keep prior behavior for status/phase/progress changes too.
-                    if (
-                        should_emit_tick
-                        or local_doc.status != last_status
-                        or local_doc.processing_phase != last_phase
-                        or local_doc.progress_percent != last_progress
-                    ):
-                        yield f"data: {json.dumps(event_data)}\n\n"
-                        
-                        last_status = local_doc.status
-                        last_phase = local_doc.processing_phase
-                        last_progress = local_doc.progress_percent
+                event_data = {
+                    "document_id": local_doc.id,
+                    "status": local_doc.status.value,
+                    "processing_phase": local_doc.processing_phase,
+                    "progress_percent": local_doc.progress_percent,
+                    "elapsed_ms": elapsed_ms,
+                    "estimated_total_ms": refined_total_ms,
+                    "estimated_remaining_ms": remaining_ms,
+                    "completed_in_ms": elapsed_ms if local_doc.status in [DocStatus.ready, DocStatus.error] else None,
+                    "file_size_bytes": file_size_bytes,
+                }
+
+                # Emit every tick while active so elapsed/remaining updates in real time.
+                should_emit_tick = local_doc.status in [DocStatus.pending, DocStatus.inserting, DocStatus.downloading]
+                
+                # Keep prior behavior for status/phase/progress changes too.
+                if (
+                    should_emit_tick
+                    or local_doc.status != last_status
+                    or local_doc.processing_phase != last_phase
+                    or local_doc.progress_percent != last_progress
+                ):
+                    yield sse_event(event_data)
                     
-                    # Stop streaming if document reached terminal state
-                    if local_doc.status in [DocStatus.ready, DocStatus.error]:
-                        elapsed_ms = int((time.perf_counter() - stream_started) * 1000)
-                        yield f"data: {json.dumps({'event': 'complete', 'status': local_doc.status.value, 'document_id': local_doc.id, 'elapsed_ms': elapsed_ms, 'completed_in_ms': elapsed_ms, 'estimated_total_ms': max(initial_estimated_total_ms, elapsed_ms), 'estimated_remaining_ms': 0})}\n\n"
-                        break
-                finally:
-                    local_db.close()
+                    last_status = local_doc.status
+                    last_phase = local_doc.processing_phase
+                    last_progress = local_doc.progress_percent
+                
+                # Stop streaming if document reached terminal state
+                if local_doc.status in [DocStatus.ready, DocStatus.error]:
+                    elapsed_ms = int((time.perf_counter() - stream_started) * 1000)
+                    yield sse_event({'event': 'complete', 'status': local_doc.status.value, 'document_id': local_doc.id, 'elapsed_ms': elapsed_ms, 'completed_in_ms': elapsed_ms, 'estimated_total_ms': max(initial_estimated_total_ms, elapsed_ms), 'estimated_remaining_ms': 0})
+                    break
                 
                 await asyncio.sleep(1)
                 
             except Exception as e:
                 logger.error(f"Error in progress stream: {e}")
-                yield f"data: {json.dumps({'event': 'error', 'message': str(e)})}\n\n"
+                yield sse_event({'event': 'error', 'message': str(e)})
                 break
     
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return sse_response(event_generator())
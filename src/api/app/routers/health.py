@@ -3,9 +3,15 @@ from fastapi import APIRouter
 from ..config import settings
 from pathlib import Path
 import shutil
+import time
 
 router = APIRouter(tags=["health"])
 
+# Probes from several orchestrators/replicas often arrive together; they share
+# one filesystem check for this long.
+HEALTH_CACHE_TTL_S = 0.5
+_health_cache: tuple[float, dict] | None = None
+
 @router.get(
     "/healthz",
     summary="Health check endpoint",
@@ -44,17 +50,25 @@ router = APIRouter(tags=["health"])
 )
 def healthz():
     """Health check - verify API and filesystem are operational"""
+    global _health_cache
+    now = time.monotonic()
+    cached = _health_cache
+    if cached is not None and now - cached[0] < HEALTH_CACHE_TTL_S:
+        return cached[1]
+
     can_write = False
     try:
         p = settings.data_root / ".healthz.tmp"
         p.write_text("ok", encoding="utf-8")
-        can_write = p.exists()
+        can_write = True
         p.unlink(missing_ok=True)
     except Exception:
         can_write = False
-    return {
+    result = {
         "ok": True,
         "data_root": str(settings.data_root),
         "can_write_data_root": can_write,
         "free_space_mb": shutil.disk_usage(settings.data_root).free // (1024*1024)
     }
+    _health_cache = (now, result)
+    return result
@@ -1,20 +1,30 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session as DBSession
 from typing import AsyncGenerator
 from pathlib import Path
-import asyncio, json
+import asyncio
+import logging
 import os
 
-from ..db import SessionLocal
+from ..db import SessionLocal, ReadSessionLocal, NO_LAZY
 from ..models import Session as SessionModel, Document, Message, Role, DocStatus, User
-from ..services.graphrag_service import DashRAGService
+from ..schemas import ChatRequest
+from ..services.graphrag_service import get_rag_service
 from ..services.background_tasks import process_message_query
 from ..services.eta_estimator import estimate_chat_total_ms
 from ..services.query_progress import get_message_progress
+from ..utils.aio import await_on_graph_loop
+from ..utils.sse import sse_event, sse_response
 from ..config import settings
 from .auth import get_current_user
 
+logger = logging.getLogger(__name__)
+
+# ChatRequest fields forwarded to nano-graphrag's QueryParam
+QP_KEYS = frozenset(ChatRequest.model_fields) - {"content"}
+
 router = APIRouter(
     prefix="/messages", 
     tags=["messages"],
@@ -28,21 +38,65 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """Session on the read-only pool, for handlers that never write."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def _graph_dir(sid: int) -> Path:
     return settings.data_root / "sessions" / str(sid) / "graph"
 
 def get_user_session(sid: int, user: User, db: DBSession) -> SessionModel:
     """Helper to get a session and verify ownership"""
-    s = db.get(SessionModel, sid)
+    s = db.get(SessionModel, sid, options=NO_LAZY)
     if not s:
         raise HTTPException(404, "Session not found")
     if s.user_id != user.id:
         raise HTTPException(403, "Access denied")
     return s
 
+def count_ready_documents(sid: int, user: User, db: DBSession) -> int:
+    """Verify session ownership and count its ready documents in a single query"""
+    row = db.execute(
+        select(SessionModel.user_id, func.count(Document.id).filter(Document.status == DocStatus.ready).label("ready"))
+        .outerjoin(Document, Document.session_id == SessionModel.id)
+        .where(SessionModel.id == sid)
+        .group_by(SessionModel.id)
+    ).first()
+    if row is None:
+        raise HTTPException(404, "Session not found")
+    if row.user_id != user.id:
+        raise HTTPException(403, "Access denied")
+    return row.ready
+
+# Sessions known to have at least one ready document, mapped to their owner.
+# Readiness only goes from false to true while a session exists (documents are
+# never un-readied or deleted individually), so a positive answer can be kept
+# until the session is deleted; negatives are always re-checked.
+_READY_CACHE: dict[int, int] = {}
+
+def session_has_ready_documents(sid: int, user: User, db: DBSession) -> bool:
+    """Ownership check plus readiness, answered from _READY_CACHE when possible"""
+    owner_id = _READY_CACHE.get(sid)
+    if owner_id is not None:
+        if owner_id != user.id:
+            raise HTTPException(403, "Access denied")
+        return True
+    if count_ready_documents(sid, user, db) == 0:
+        return False
+    _READY_CACHE[sid] = user.id
+    return True
+
+def forget_ready_session(sid: int) -> None:
+    """Drop a session from the readiness cache (call when the session is deleted)."""
+    _READY_CACHE.pop(sid, None)
+
 @router.get(
     "", 
-    response_model=list[dict],
+    response_model=None,
     summary="Get chat history",
     description="""
     Retrieve all messages in a session's chat history.
@@ -80,15 +134,24 @@ def get_user_session(sid: int, user: User, db: DBSession) -> SessionModel:
         }
     }
 )
-def list_messages(sid: int = Query(..., description="Session ID"), user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
+async def list_messages(sid: int = Query(..., description="Session ID"), user: User = Depends(get_current_user), db: DBSession = Depends(get_read_db)):
     """Get all messages in a session"""
-    get_user_session(sid, user, db)
-    rows = db.query(Message).filter(Message.session_id==sid).order_by(Message.created_at.asc()).all()
+    def load():
+        get_user_session(sid, user, db)
+        # Column select: skips token_usage and ORM instance construction per message.
+        return db.execute(
+            select(Message.id, Message.role, Message.content)
+            .where(Message.session_id == sid)
+            .order_by(Message.created_at.asc())
+        ).all()
+
+    # Only the query borrows a worker thread; building the response stays on the loop.
+    rows = await run_in_threadpool(load)
     return [{"id": m.id, "role": m.role.value, "content": m.content} for m in rows]
 
 @router.post(
     "", 
-    response_model=dict,
+    response_model=None,
     status_code=202,
     summary="Query knowledge graph (non-streaming)",
     description="""
@@ -157,64 +220,59 @@ def list_messages(sid: int = Query(..., description="Session ID"), user: User =
         404: {"description": "Session not found"}
     }
 )
-async def create_message(
+def create_message(
     background_tasks: BackgroundTasks,
+    payload: ChatRequest,
     sid: int = Query(..., description="Session ID"),
-    payload: dict = None,
     user: User = Depends(get_current_user),
     db: DBSession = Depends(get_db)
 ):
     """Query the knowledge graph in the background"""
-    sess = get_user_session(sid, user, db)
-
-    has_ready = db.query(Document).filter(Document.session_id==sid, Document.status==DocStatus.ready).count() > 0
-    if not has_ready:
+    if not session_has_ready_documents(sid, user, db):
         raise HTTPException(400, "Add at least one ready document before querying")
 
-    prompt = payload.get("content")
-    if not prompt or not isinstance(prompt, str):
-        raise HTTPException(400, "content must be a string")
+    prompt = payload.content
+    if not prompt:
+        raise HTTPException(400, "content must not be empty")
 
     # Create user message immediately
     m_user = Message(session_id=sid, role=Role.user, content={"text": prompt})
     db.add(m_user)
+    db.flush()  # assigns m_user.id without a reload after commit
+    message_id = m_user.id
     db.commit()
-    db.refresh(m_user)
-
-    # Extract query parameters
-    qp_kwargs = {k: payload.get(k) for k in [
-        "mode", "top_k", "level", "response_type", "only_need_context",
-        "include_text_chunks_in_context", "global_max_consider_community",
-        "global_min_community_rating", "naive_max_token_for_text_unit"
-    ]}
-
-    ready_docs = db.query(Document).filter(
-        Document.session_id == sid,
-        Document.status == DocStatus.ready,
-    ).all()
-    total_pages = sum(d.pages or 0 for d in ready_docs)
+
+    # Extract query parameters (unset and null ones fall back to QueryParam defaults)
+    qp_kwargs = payload.model_dump(include=QP_KEYS, exclude_none=True)
+
+    is_ready = (Document.session_id == sid) & (Document.status == DocStatus.ready)
+    ready_doc_count, counted_docs, total_pages = db.execute(
+        select(func.count(Document.id), func.count(Document.pages), func.coalesce(func.sum(Document.pages), 0))
+        .where(is_ready)
+    ).one()
     total_doc_bytes = 0
-    for doc in ready_docs:
-        try:
-            if doc.local_pdf_path and os.path.exists(doc.local_pdf_path):
-                total_doc_bytes += os.path.getsize(doc.local_pdf_path)
-        except OSError:
-            continue
+    if counted_docs < ready_doc_count:
+        # Approximate page contribution when page counts are unavailable.
+        for pdf_path in db.scalars(select(Document.local_pdf_path).where(is_ready, Document.pages.is_(None))):
+            try:
+                if pdf_path and os.path.exists(pdf_path):
+                    total_doc_bytes += os.path.getsize(pdf_path)
+            except OSError:
+                continue
 
     prompt_length = len(prompt)
-    # Approximate page contribution when page counts are unavailable.
     page_proxy = total_pages + int(total_doc_bytes / (1024 * 1024) * 3)
     estimated_total_ms = estimate_chat_total_ms(
         mode=str(qp_kwargs.get("mode") or "local"),
         prompt_length=prompt_length,
-        ready_doc_count=len(ready_docs),
+        ready_doc_count=ready_doc_count,
         ready_doc_pages=page_proxy,
     )
 
     # Schedule background processing
     background_tasks.add_task(
         process_message_query,
-        message_id=m_user.id,
+        message_id=message_id,
         session_id=sid,
         prompt=prompt,
         graph_dir=_graph_dir(sid),
@@ -223,7 +281,7 @@ async def create_message(
     )
 
     return {
-        "message_id": m_user.id,
+        "message_id": message_id,
         "status": "processing",
         "estimated_total_ms": estimated_total_ms,
     }
@@ -231,18 +289,18 @@ async def create_message(
 
 @router.get(
     "/progress",
-    response_model=dict,
+    response_model=None,
     summary="Get live progress for a processing message",
 )
 def get_message_progress_status(
     sid: int = Query(..., description="Session ID"),
     message_id: int = Query(..., description="User message ID returned by POST /messages"),
     user: User = Depends(get_current_user),
-    db: DBSession = Depends(get_db),
+    db: DBSession = Depends(get_read_db),
 ):
     get_user_session(sid, user, db)
 
-    msg = db.get(Message, message_id)
+    msg = db.get(Message, message_id, options=NO_LAZY)
     if not msg or msg.session_id != sid or msg.role != Role.user:
         raise HTTPException(404, "Message not found")
 
@@ -290,6 +348,24 @@ def get_message_progress_status(
         "error": None,
     }
 
+def _save_assistant_message(sid: int, content: dict) -> None:
+    db = SessionLocal()
+    try:
+        db.add(Message(session_id=sid, role=Role.assistant, content=content))
+        db.commit()
+    finally:
+        db.close()
+
+# Streaming query tasks still running. The event loop only keeps weak
+# references to tasks, so this keeps a query alive after its client disconnects.
+_stream_query_tasks: set[asyncio.Task] = set()
+
+def _finish_stream_query(task: asyncio.Task) -> None:
+    _stream_query_tasks.discard(task)
+    # Retrieves the exception so it is logged once even if no client is left to receive it.
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Streaming query failed: {task.exception()}")
+
 @router.post(
     "/stream",
     summary="Query with streaming response (SSE)",
@@ -359,56 +435,55 @@ def get_message_progress_status(
         404: {"description": "Session not found"}
     }
 )
-async def create_message_stream(sid: int = Query(..., description="Session ID"), payload: dict = None, user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
+async def create_message_stream(payload: ChatRequest, sid: int = Query(..., description="Session ID"), user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
     """Query with SSE streaming response"""
-    sess = get_user_session(sid, user, db)
+    # Blocking DB work runs in the threadpool and the RAG query on the shared GraphRAG loop.
+    def save_user_message() -> str:
+        if not session_has_ready_documents(sid, user, db):
+            raise HTTPException(400, "Add at least one ready document before querying")
 
-    has_ready = db.query(Document).filter(Document.session_id==sid, Document.status==DocStatus.ready).count() > 0
-    if not has_ready:
-        raise HTTPException(400, "Add at least one ready document before querying")
+        prompt = payload.content
+        if not prompt:
+            raise HTTPException(400, "content must not be empty")
 
-    prompt = payload.get("content")
-    if not prompt or not isinstance(prompt, str):
-        raise HTTPException(400, "content must be a string")
+        m_user = Message(session_id=sid, role=Role.user, content={"text": prompt})
+        db.add(m_user)
+        db.commit()
+        return prompt
 
-    m_user = Message(session_id=sid, role=Role.user, content={"text": prompt})
-    db.add(m_user); db.commit(); db.refresh(m_user)
+    prompt = await run_in_threadpool(save_user_message)
 
-    qp_kwargs = {k: payload.get(k) for k in [
-        "mode", "top_k", "level", "response_type", "only_need_context",
-        "include_text_chunks_in_context", "global_max_consider_community",
-        "global_min_community_rating", "naive_max_token_for_text_unit"
-    ]}
+    query_kwargs = payload.model_dump(include=QP_KEYS, exclude_none=True)
 
-    rag = DashRAGService(_graph_dir(sid))
-    try:
-        answer_payload = await rag.query(prompt, **{k:v for k,v in qp_kwargs.items() if v is not None})
-    except ValueError as e:
-        # User-friendly error messages
-        async def err_stream():
-            payload = {"type": "error", "message": str(e)}
-            yield ("data: " + json.dumps(payload) + "\n\n").encode("utf-8")
-        return StreamingResponse(err_stream(), media_type="text/event-stream")
-    except Exception as e:
-        # Internal errors
-        async def err_stream():
-            payload = {"type": "error", "message": f"Query failed: {str(e)}"}
-            yield ("data: " + json.dumps(payload) + "\n\n").encode("utf-8")
-        return StreamingResponse(err_stream(), media_type="text/event-stream")
-
-    # Persist assistant message before streaming
-    m_asst = Message(
-        session_id=sid,
-        role=Role.assistant,
-        content=answer_payload if isinstance(answer_payload, dict) else {"text": str(answer_payload)},
-    )
-    db.add(m_asst); db.commit(); db.refresh(m_asst)
+    async def answer_and_persist() -> dict:
+        # Loading the graph reads several files from disk, so do it off the loop.
+        rag = await run_in_threadpool(get_rag_service, _graph_dir(sid), for_query=True)
+        answer_payload = await await_on_graph_loop(rag.query(prompt, **query_kwargs))
+        content = answer_payload if isinstance(answer_payload, dict) else {"text": str(answer_payload)}
+        await run_in_threadpool(_save_assistant_message, sid, content)
+        return content
 
-    answer_text = answer_payload.get("text", "") if isinstance(answer_payload, dict) else str(answer_payload)
-    citations = answer_payload.get("citations", []) if isinstance(answer_payload, dict) else []
+    # The query runs as its own task so the response starts immediately and the
+    # answer is still saved if the client disconnects before it is ready.
+    query_task = asyncio.create_task(answer_and_persist())
+    _stream_query_tasks.add(query_task)
+    query_task.add_done_callback(_finish_stream_query)
 
     async def event_stream() -> AsyncGenerator[bytes, None]:
-        yield f"data: {json.dumps({'type': 'token', 'text': answer_text})}\n\n".encode("utf-8")
-        yield f"data: {json.dumps({'type': 'done', 'citations': citations})}\n\n".encode("utf-8")
+        # Comment frame: flushes headers to the client right away; EventSource ignores it.
+        yield b": processing\n\n"
+        try:
+            content = await asyncio.shield(query_task)
+        except ValueError as e:
+            # User-friendly error messages
+            yield sse_event({"type": "error", "message": str(e)})
+            return
+        except Exception as e:
+            # Internal errors
+            yield sse_event({"type": "error", "message": f"Query failed: {str(e)}"})
+            return
+
+        yield sse_event({"type": "token", "text": content.get("text", "")})
+        yield sse_event({"type": "done", "citations": content.get("citations", [])})
 
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+    return sse_response(event_stream())
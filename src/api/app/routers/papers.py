@@ -1,6 +1,7 @@
 
-from fastapi import APIRouter
-from ..utils.arxiv_utils import search_arxiv
+from fastapi import APIRouter, Response
+from ..config import settings
+from ..utils.arxiv_utils import search_arxiv_cached
 
 router = APIRouter(
     prefix="/papers", 
@@ -9,7 +10,7 @@ router = APIRouter(
 
 @router.get(
     "/search", 
-    response_model=list[dict],
+    response_model=None,
     summary="Search arXiv papers (global)",
     description="""
     Search arXiv papers without being tied to a specific session.
@@ -21,7 +22,7 @@ router = APIRouter(
     
     **Query parameters:**
     - `query` (required): Search terms (e.g., "machine learning healthcare")
-    - `max_results` (optional, default=10): Maximum papers to return
+    - `max_results` (optional, default=10): Maximum papers to return (capped at ARXIV_MAX_RESULTS)
     
     **Search tips:**
     - Use specific terms: "transformer attention" vs "AI"
@@ -63,6 +64,8 @@ router = APIRouter(
         }
     }
 )
-def papers_search(query: str, max_results: int = 10):
+def papers_search(response: Response, query: str, max_results: int = 10):
     """Search arXiv papers globally (not session-specific)"""
-    return search_arxiv(query, max_results=max_results)
+    max_results = min(max_results, settings.arxiv_max_results)
+    response.headers["Cache-Control"] = "private, max-age=60"
+    return search_arxiv_cached(query, max_results=max_results)
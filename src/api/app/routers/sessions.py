@@ -1,13 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session as DBSession
+from email.utils import formatdate
 from pathlib import Path
-import shutil, tempfile
+import contextlib
+import os
 
-from ..db import SessionLocal
+from ..db import SessionLocal, NO_LAZY
 from ..models import Session as SessionModel, Document as DocumentModel, Message as MessageModel, User
 from ..config import settings
+from ..services.graphrag_service import evict_rag_service
+from ..utils.locks import forget_lock_file
+from ..utils.trash import move_to_trash, purge
+from ..utils.zip_stream import iter_zip, tree_fingerprint
 from .auth import get_current_user
+from .messages import forget_ready_session
 
 router = APIRouter(
     prefix="/sessions", 
@@ -27,7 +35,7 @@ def _session_root(sid: int) -> Path:
 
 def get_user_session(sid: int, user: User, db: DBSession) -> SessionModel:
     """Helper to get a session and verify ownership"""
-    s = db.get(SessionModel, sid)
+    s = db.get(SessionModel, sid, options=NO_LAZY)
     if not s:
         raise HTTPException(404, "Session not found")
     if s.user_id != user.id:
@@ -36,7 +44,7 @@ def get_user_session(sid: int, user: User, db: DBSession) -> SessionModel:
 
 @router.post(
     "", 
-    response_model=dict,
+    response_model=None,
     status_code=201,
     summary="Create a new session",
     description="""
@@ -75,17 +83,21 @@ def get_user_session(sid: int, user: User, db: DBSession) -> SessionModel:
 def create_session(payload: dict, user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
     """Create a new session with optional title"""
     title = payload.get("title") or "New Session"
-    s = SessionModel(user_id=user.id, title=title, graph_dir=str(_session_root("tmp") / "graph"))
-    db.add(s); db.commit(); db.refresh(s)
+    s = SessionModel(user_id=user.id, title=title, graph_dir="")
+    db.add(s); db.flush()  # INSERT assigns s.id; graph_dir is filled in the same transaction
     s.graph_dir = str(_session_root(s.id) / "graph")
-    db.commit(); db.refresh(s)
-    Path(s.graph_dir).mkdir(parents=True, exist_ok=True)
-    (_session_root(s.id) / "uploads").mkdir(parents=True, exist_ok=True)
+    db.commit()
+    # One ancestor walk creates the session root and graph/; uploads/ then only
+    # needs a single mkdir next to it.
+    root = _session_root(s.id)
+    os.makedirs(root / "graph", exist_ok=True)
+    with contextlib.suppress(FileExistsError):
+        os.mkdir(root / "uploads")
     return {"id": s.id, "title": s.title, "settings": s.settings, "stats": {"doc_count": 0}}
 
 @router.get(
     "", 
-    response_model=list[dict],
+    response_model=None,
     summary="List all sessions",
     description="""
     Retrieve all chat sessions, ordered by creation date (newest first).
@@ -118,31 +130,51 @@ def create_session(payload: dict, user: User = Depends(get_current_user), db: DB
 )
 def list_sessions(user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
     """Get all sessions for the current user"""
-    rows = db.query(SessionModel).filter(SessionModel.user_id == user.id).order_by(SessionModel.created_at.desc()).all()
+    # One query: plain rows with just the columns the response uses, plus the
+    # per-session counts as correlated subqueries (served by the session_id
+    # indexes), instead of two COUNT queries per session.
+    doc_count = (
+        select(func.count(DocumentModel.id))
+        .where(DocumentModel.session_id == SessionModel.id)
+        .correlate(SessionModel)
+        .scalar_subquery()
+    )
+    msg_count = (
+        select(func.count(MessageModel.id))
+        .where(MessageModel.session_id == SessionModel.id)
+        .correlate(SessionModel)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(
+            SessionModel.id, SessionModel.title, SessionModel.settings, SessionModel.graph_dir, SessionModel.updated_at,
+            doc_count.label("doc_count"), msg_count.label("msg_count"),
+        )
+        .where(SessionModel.user_id == user.id)
+        .order_by(SessionModel.created_at.desc())
+    ).all()
     
     result = []
     for r in rows:
-        # Count documents and messages for this session
-        doc_count = db.query(DocumentModel).filter_by(session_id=r.id).count()
-        msg_count = db.query(MessageModel).filter_by(session_id=r.id).count()
-        
         result.append({
             "id": r.id,
             "title": r.title,
             "settings": r.settings,
-            "created_at": r.updated_at.isoformat(),
+            "created_at": r.updated_at,
             "stats": {
-                "document_count": doc_count,
-                "message_count": msg_count,
+                "document_count": r.doc_count,
+                "message_count": r.msg_count,
                 "graph_exists": Path(r.graph_dir).exists()
             }
         })
     
-    return result
+    # Returned as a response so FastAPI skips its jsonable_encoder walk over
+    # every row; orjson writes the datetimes in the same ISO format natively.
+    return ORJSONResponse(result)
 
 @router.get(
     "/detail", 
-    response_model=dict,
+    response_model=None,
     summary="Get session details",
     description="""
     Retrieve detailed information about a specific session.
@@ -161,7 +193,7 @@ def list_sessions(user: User = Depends(get_current_user), db: DBSession = Depend
                         "id": 1,
                         "title": "Healthcare LLMs Research",
                         "settings": {},
-                        "stats": {"graph_exists": True}
+                        "stats": {"doc_count": 2, "graph_exists": True}
                     }
                 }
             }
@@ -173,12 +205,13 @@ def get_session(sid: int = Query(..., description="Session ID"), user: User = De
     """Get details for a specific session"""
     s = get_user_session(sid, user, db)
     graph_dir = Path(s.graph_dir)
-    stats = {"graph_exists": graph_dir.exists()}
+    doc_count = db.scalar(select(func.count(DocumentModel.id)).where(DocumentModel.session_id == sid))
+    stats = {"doc_count": doc_count, "graph_exists": graph_dir.exists()}
     return {"id": s.id, "title": s.title, "settings": s.settings, "stats": stats}
 
 @router.patch(
     "",
-    response_model=dict,
+    response_model=None,
     summary="Update session",
     description="""
     Update session properties like title.
@@ -215,12 +248,11 @@ def update_session(payload: dict, sid: int = Query(..., description="Session ID"
         s.title = payload["title"]
     
     db.commit()
-    db.refresh(s)
     return {"id": s.id, "title": s.title, "settings": s.settings}
 
 @router.delete(
     "", 
-    response_model=dict,
+    response_model=None,
     summary="Delete a session",
     description="""
     Permanently delete a session and all associated data:
@@ -246,15 +278,22 @@ def update_session(payload: dict, sid: int = Query(..., description="Session ID"
         404: {"description": "Session not found"}
     }
 )
-def delete_session(sid: int = Query(..., description="Session ID"), user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
+def delete_session(background_tasks: BackgroundTasks, sid: int = Query(..., description="Session ID"), user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
     """Delete a session and all its data"""
     s = get_user_session(sid, user, db)
     base = Path(s.graph_dir).parent
-    try:
-        shutil.rmtree(base, ignore_errors=True)
-    except Exception:
-        pass
+    evict_rag_service(Path(s.graph_dir))
+    forget_ready_session(sid)
+    forget_lock_file(_session_root(sid) / ".lock")
     db.delete(s); db.commit()
+    # Rename now, remove the tree after the response; anything left behind by
+    # a restart is swept on the next startup.
+    try:
+        trashed = move_to_trash(base)
+    except OSError:
+        trashed = base
+    if trashed is not None:
+        background_tasks.add_task(purge, trashed)
     return {"ok": True}
 
 @router.get(
@@ -285,14 +324,37 @@ def delete_session(sid: int = Query(..., description="Session ID"), user: User =
         404: {"description": "Session not found or directory missing"}
     }
 )
-def export_session(sid: int = Query(..., description="Session ID"), user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
+def export_session(request: Request, sid: int = Query(..., description="Session ID"), user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
     """Export session data as a ZIP file"""
     s = get_user_session(sid, user, db)
     base = _session_root(sid)
     if not base.exists():
         raise HTTPException(404, "Session directory missing")
-    tmp_dir = settings.data_root / "exports"
-    tmp_dir.mkdir(parents=True, exist_ok=True)
-    zip_base = tmp_dir / str(sid)
-    zip_path = shutil.make_archive(str(zip_base), "zip", root_dir=base)
-    return FileResponse(zip_path, filename=f"session_{sid}.zip", media_type="application/zip")
+
+    # Weak validator: the archive's bytes follow from the files' contents and
+    # mtimes, which this fingerprint tracks without reading them.
+    count, total, newest = tree_fingerprint(base)
+    etag = f'W/"{sid}-{count}-{total:x}-{newest:x}"'
+    cache_headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(newest / 1e9, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers)
+
+    # Streamed straight from the session directory; no archive is written to disk.
+    return StreamingResponse(
+        iter_zip(base),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="session_{sid}.zip"', **cache_headers},
+    )
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
@@ -1,5 +1,5 @@
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, Literal
 
 class SessionCreate(BaseModel):
@@ -29,6 +29,20 @@ class DocumentResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class DocSummary(BaseModel):
+    """Row returned by GET /documents."""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str | None = None
+    source_type: str
+    status: str
+    arxiv_id: str | None = None
+    pages: int | None = None
+
+class AddArxivRequest(BaseModel):
+    arxiv_id: str
+
 class ChatRequest(BaseModel):
     content: str
     mode: Literal["local","global","naive"] | None = None
@@ -8,17 +8,18 @@ API responses during PDF extraction, knowledge graph insertion, and query execut
 from pathlib import Path
 from sqlalchemy.orm import Session as DBSession
 import logging
-import traceback
+import os
 import asyncio
 import time
 from datetime import datetime, timezone
 
 from ..models import Document, DocStatus, Message, Role, ProcessingPhase
-from ..utils.pdf_utils import extract_text
+from ..utils.pdf_utils import extract_text_in_worker
 from ..utils.arxiv_utils import download_pdf
-from ..utils.locks import session_lock
-from ..services.graphrag_service import DashRAGService
-from ..services.progress_tracker import attach_progress_handler, detach_progress_handler
+from ..utils.aio import run_on_graph_loop
+from ..utils.insert_log import error_insert_log
+from ..services.graphrag_service import get_rag_service
+from ..services.ingest_batcher import PendingIngest, submit_ingest
 from ..services.eta_estimator import estimate_remaining_ms
 from ..services.query_progress import (
     start_message_progress,
@@ -26,12 +27,19 @@ from ..services.query_progress import (
     complete_message_progress,
     fail_message_progress,
 )
-from ..db import SessionLocal
+from ..db import SessionLocal, NO_LAZY
 from ..config import settings
 
 logger = logging.getLogger(__name__)
 
 
+def _ensure_dir(path: Path) -> None:
+    # The graph directory almost always exists already (created with the
+    # session); one stat is cheaper than makedirs walking and failing mkdir.
+    if not os.path.isdir(path):
+        os.makedirs(path, exist_ok=True)
+
+
 def process_uploaded_document(
     doc_id: int,
     session_id: int,
@@ -42,8 +50,8 @@ def process_uploaded_document(
     """
     Background task to process an uploaded PDF document.
     
-    This runs synchronously in FastAPI's background thread pool.
-    GraphRAG async operations are executed via asyncio.run().
+    This runs synchronously on the ingest worker pool (see ingest_queue).
+    GraphRAG async operations are executed via run_on_graph_loop().
     
     Args:
         doc_id: Document ID
@@ -54,7 +62,7 @@ def process_uploaded_document(
     """
     db = SessionLocal()
     try:
-        doc = db.get(Document, doc_id)
+        doc = db.get(Document, doc_id, options=NO_LAZY)
         if not doc:
             logger.error(f"Document {doc_id} not found for processing")
             return
@@ -62,12 +70,13 @@ def process_uploaded_document(
         logger.info(f"Background processing document {doc_id} from session {session_id}")
         
         # Phase 1: Extract text from PDF
+        doc.status = DocStatus.inserting
         doc.processing_phase = ProcessingPhase.pdf_extraction.value
         doc.progress_percent = 10
         db.commit()
         
         try:
-            text, pages = extract_text(pdf_path)
+            text, pages = extract_text_in_worker(pdf_path)
             doc.pages = pages
             doc.progress_percent = 15
             db.commit()
@@ -76,60 +85,22 @@ def process_uploaded_document(
             error_msg = f"Failed to extract text from PDF: {str(e)}"
             logger.error(error_msg, exc_info=True)
             doc.status = DocStatus.error
-            doc.insert_log = f"{error_msg}\n\nTraceback:\n{traceback.format_exc()}"
+            doc.insert_log = error_insert_log(session_id, doc_id, error_msg, e)
             db.commit()
             return
         
-        # Phase 2: Insert into knowledge graph with progress tracking
-        graph_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Attach progress handler to track nano-graphrag logs
-        progress_handler = attach_progress_handler(doc_id, db)
-        
-        try:
-            with session_lock(lock_file):
-                try:
-                    # Run async GraphRAG operation in new event loop
-                    asyncio.run(DashRAGService(graph_dir).insert_texts(text))
-                    doc.status = DocStatus.ready
-                    doc.processing_phase = None
-                    doc.progress_percent = 100
-                    
-                    # Check if there were any warnings in the log
-                    if "incomplete knowledge graph" in (doc.insert_log or "").lower():
-                        doc.insert_log = (doc.insert_log or "") + "\n\nWarning: Community reports may be incomplete due to LLM JSON formatting issues."
-                    
-                    logger.info(f"Document {doc_id} successfully inserted into knowledge graph")
-                except Exception as e:
-                    error_msg = f"GraphRAG insertion failed: {str(e)}"
-                    
-                    # Check if it's a JSON parsing error that we can recover from
-                    if "JSONDecodeError" in str(e) or "Expecting ':' delimiter" in str(e):
-                        logger.warning(f"Document {doc_id} encountered JSON parsing errors during community report generation, but entities may have been extracted")
-                        # Mark as ready with a warning note
-                        doc.status = DocStatus.ready
-                        doc.processing_phase = None
-                        doc.progress_percent = 100
-                        doc.insert_log = f"Warning: Community reports incomplete due to LLM response formatting issues.\n\nEntities and relationships were successfully extracted, but some high-level summaries may be missing.\n\nOriginal error: {str(e)}"
-                        logger.info(f"Document {doc_id} marked as ready with warnings")
-                    else:
-                        logger.error(error_msg, exc_info=True)
-                        doc.status = DocStatus.error
-                        doc.processing_phase = None
-                        doc.progress_percent = 0
-                        doc.insert_log = f"{error_msg}\n\nTraceback:\n{traceback.format_exc()}"
-                db.commit()
-        finally:
-            # Always remove the progress handler
-            detach_progress_handler(progress_handler)
+        # Phase 2: Insert into knowledge graph (coalesced with other pending
+        # documents for this session, progress tracked per document)
+        _ensure_dir(graph_dir)
+        submit_ingest(PendingIngest(doc_id, session_id, text), graph_dir, lock_file)
     
     except Exception as e:
         logger.error(f"Unexpected error processing document {doc_id}: {str(e)}", exc_info=True)
         try:
-            doc = db.get(Document, doc_id)
+            doc = db.get(Document, doc_id, options=NO_LAZY)
             if doc:
                 doc.status = DocStatus.error
-                doc.insert_log = f"Unexpected error: {str(e)}\n\nTraceback:\n{traceback.format_exc()}"
+                doc.insert_log = error_insert_log(session_id, doc_id, f"Unexpected error: {str(e)}", e)
                 db.commit()
         except Exception:
             pass
@@ -148,8 +119,8 @@ def process_arxiv_document(
     """
     Background task to download and process an arXiv paper.
     
-    This runs synchronously in FastAPI's background thread pool.
-    GraphRAG async operations are executed via asyncio.run().
+    This runs synchronously on the ingest worker pool (see ingest_queue).
+    GraphRAG async operations are executed via run_on_graph_loop().
     
     Args:
         doc_id: Document ID
@@ -161,7 +132,7 @@ def process_arxiv_document(
     """
     db = SessionLocal()
     try:
-        doc = db.get(Document, doc_id)
+        doc = db.get(Document, doc_id, options=NO_LAZY)
         if not doc:
             logger.error(f"Document {doc_id} not found for processing")
             return
@@ -169,23 +140,25 @@ def process_arxiv_document(
         logger.info(f"Background processing arXiv paper {arxiv_id} (doc {doc_id}) from session {session_id}")
         
         # Download PDF from arXiv
+        doc.status = DocStatus.downloading
+        db.commit()
         try:
             pdf_path = Path(download_pdf(arxiv_id, uploads_dir))
+            # Committed together with the extraction result below
             doc.local_pdf_path = str(pdf_path)
             doc.status = DocStatus.inserting
-            db.commit()
             logger.info(f"Downloaded arXiv PDF {arxiv_id} to {pdf_path}")
         except Exception as e:
             error_msg = f"Failed to download arXiv paper {arxiv_id}: {str(e)}"
             logger.error(error_msg, exc_info=True)
             doc.status = DocStatus.error
-            doc.insert_log = f"{error_msg}\n\nTraceback:\n{traceback.format_exc()}"
+            doc.insert_log = error_insert_log(session_id, doc_id, error_msg, e)
             db.commit()
             return
         
         # Extract text from PDF
         try:
-            text, pages = extract_text(pdf_path)
+            text, pages = extract_text_in_worker(pdf_path)
             doc.pages = pages
             db.commit()
             logger.info(f"Extracted {pages} pages from arXiv paper {arxiv_id}")
@@ -193,60 +166,22 @@ def process_arxiv_document(
             error_msg = f"Failed to extract text from PDF: {str(e)}"
             logger.error(error_msg, exc_info=True)
             doc.status = DocStatus.error
-            doc.insert_log = f"{error_msg}\n\nTraceback:\n{traceback.format_exc()}"
+            doc.insert_log = error_insert_log(session_id, doc_id, error_msg, e)
             db.commit()
             return
         
-        # Phase 2: Insert into knowledge graph with progress tracking
-        graph_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Attach progress handler to track nano-graphrag logs
-        progress_handler = attach_progress_handler(doc_id, db)
-        
-        try:
-            with session_lock(lock_file):
-                try:
-                    # Run async GraphRAG operation in new event loop
-                    asyncio.run(DashRAGService(graph_dir).insert_texts(text))
-                    doc.status = DocStatus.ready
-                    doc.processing_phase = None
-                    doc.progress_percent = 100
-                    
-                    # Check if there were any warnings in the log
-                    if "incomplete knowledge graph" in (doc.insert_log or "").lower():
-                        doc.insert_log = (doc.insert_log or "") + "\n\nWarning: Community reports may be incomplete due to LLM JSON formatting issues."
-                    
-                    logger.info(f"Document {doc_id} (arXiv: {arxiv_id}) successfully inserted into knowledge graph")
-                except Exception as e:
-                    error_msg = f"GraphRAG insertion failed: {str(e)}"
-                    
-                    # Check if it's a JSON parsing error that we can recover from
-                    if "JSONDecodeError" in str(e) or "Expecting ':' delimiter" in str(e):
-                        logger.warning(f"Document {doc_id} (arXiv: {arxiv_id}) encountered JSON parsing errors during community report generation, but entities may have been extracted")
-                        # Mark as ready with a warning note
-                        doc.status = DocStatus.ready
-                        doc.processing_phase = None
-                        doc.progress_percent = 100
-                        doc.insert_log = f"Warning: Community reports incomplete due to LLM response formatting issues.\n\nEntities and relationships were successfully extracted, but some high-level summaries may be missing.\n\nOriginal error: {str(e)}"
-                        logger.info(f"Document {doc_id} (arXiv: {arxiv_id}) marked as ready with warnings")
-                    else:
-                        logger.error(error_msg, exc_info=True)
-                        doc.status = DocStatus.error
-                        doc.processing_phase = None
-                        doc.progress_percent = 0
-                        doc.insert_log = f"{error_msg}\n\nTraceback:\n{traceback.format_exc()}"
-                db.commit()
-        finally:
-            # Always remove the progress handler
-            detach_progress_handler(progress_handler)
+        # Phase 2: Insert into knowledge graph (coalesced with other pending
+        # documents for this session, progress tracked per document)
+        _ensure_dir(graph_dir)
+        submit_ingest(PendingIngest(doc_id, session_id, text), graph_dir, lock_file)
     
     except Exception as e:
         logger.error(f"Unexpected error processing arXiv document {doc_id}: {str(e)}", exc_info=True)
         try:
-            doc = db.get(Document, doc_id)
+            doc = db.get(Document, doc_id, options=NO_LAZY)
             if doc:
                 doc.status = DocStatus.error
-                doc.insert_log = f"Unexpected error: {str(e)}\n\nTraceback:\n{traceback.format_exc()}"
+                doc.insert_log = error_insert_log(session_id, doc_id, f"Unexpected error: {str(e)}", e)
                 db.commit()
         except Exception:
             pass
@@ -266,7 +201,7 @@ def process_message_query(
     Background task to process a user message query.
     
     This runs synchronously in FastAPI's background thread pool.
-    GraphRAG async operations are executed via asyncio.run().
+    GraphRAG async operations are executed via run_on_graph_loop().
     
     Args:
         message_id: User message ID
@@ -277,7 +212,7 @@ def process_message_query(
     """
     db = SessionLocal()
     try:
-        msg = db.get(Message, message_id)
+        msg = db.get(Message, message_id, options=NO_LAZY)
         if not msg:
             logger.error(f"Message {message_id} not found for processing")
             return
@@ -313,7 +248,7 @@ def process_message_query(
         _sync_progress("preparing_query", "Preparing query", 10)
         
         # Execute query against knowledge graph
-        rag = DashRAGService(graph_dir)
+        rag = get_rag_service(graph_dir, for_query=True)
         try:
             # Run async GraphRAG operation with a hard timeout to prevent infinite hangs.
             # Timeout is controlled by QUERY_TIMEOUT_SECONDS env var (default: 180s).
@@ -324,7 +259,7 @@ def process_message_query(
                     rag.query(prompt, **cleaned_qp_kwargs),
                     timeout=float(settings.query_timeout_seconds)
                 )
-            answer_payload = asyncio.run(_timed_query())
+            answer_payload = run_on_graph_loop(_timed_query())
             _sync_progress("building_response", "Building response", 85)
             logger.info(f"Query completed successfully for message {message_id}")
         except asyncio.TimeoutError:
@@ -1,6 +1,11 @@
 
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List, Any
+from threading import Lock
+from types import MappingProxyType
+from typing import Optional, List, Any, Mapping
+import hashlib
 import os
 import logging
 import csv
@@ -404,10 +409,14 @@ def _build_citations(mode: str, contexts: list[Any]) -> list[dict[str, Any]]:
 
     return _rank_and_trim_citations(citations)
 
-def resolve_provider_kwargs() -> dict:
+@lru_cache(maxsize=1)
+def resolve_provider_kwargs() -> Mapping[str, bool]:
     """
     Resolve LLM provider configuration for nano-graphrag.
     
+    Settings are frozen for the life of the process, so this is resolved (and
+    logged) once; the result is read-only because every caller shares it.
+    
     Returns only boolean flags (using_gemini, using_azure_openai).
     The GraphRAG.__post_init__ method will automatically set the appropriate
     model functions based on these flags.
@@ -418,20 +427,65 @@ def resolve_provider_kwargs() -> dict:
     use_azure = settings.ngr_use_azure_openai
     
     if use_gemini is None:
-        use_gemini = bool(os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"))
+        use_gemini = bool(settings.gemini_api_key or settings.google_api_key)
     if use_azure is None:
-        use_azure = bool(os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"))
+        use_azure = bool(settings.azure_openai_api_key and settings.azure_openai_endpoint)
 
     if use_azure:
         logger.info("Using Azure OpenAI for GraphRAG")
-        return dict(using_azure_openai=True)
+        return MappingProxyType({"using_azure_openai": True})
     if use_gemini:
         logger.info("Using Gemini for GraphRAG")
-        return dict(using_gemini=True)
+        return MappingProxyType({"using_gemini": True})
     
     # Default to OpenAI-compatible (via environment variables)
     logger.info("Using OpenAI for GraphRAG")
-    return dict()
+    return MappingProxyType({})
+
+def _graph_stamp(working_dir: Path) -> int:
+    # Every insert rewrites kv_store_full_docs.json while queries only touch the
+    # LLM response cache, so its mtime tells us whether the graph on disk has
+    # changed since a cached instance loaded it (e.g. from another worker).
+    try:
+        return (working_dir / "kv_store_full_docs.json").stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+# Fingerprint of the API key nano-graphrag's shared Gemini client was built with.
+# The client is process-wide, so it is (re)built only when the key changes
+# rather than on every DashRAGService construction. Its HTTP session binds to
+# the loop that first uses it; sharing it is safe only because every GraphRAG
+# coroutine runs on the single loop behind utils.aio.run_on_graph_loop.
+_gemini_client_fingerprint: str | None = None
+_gemini_client_lock = Lock()
+
+def _ensure_gemini_client() -> None:
+    """Point nano-graphrag's global Gemini client at the configured API key."""
+    global _gemini_client_fingerprint
+    gemini_key = os.getenv("GEMINI_API_KEY", "")
+    if not gemini_key and settings.gemini_api_key:
+        os.environ["GEMINI_API_KEY"] = settings.gemini_api_key
+        gemini_key = settings.gemini_api_key
+    if not gemini_key:
+        # nano-graphrag falls back to building its own client from the environment
+        logger.error("GEMINI_API_KEY not found in environment or settings!")
+        return
+
+    fingerprint = hashlib.sha256(gemini_key.encode()).hexdigest()
+    with _gemini_client_lock:
+        if fingerprint == _gemini_client_fingerprint:
+            return
+        try:
+            from nano_graphrag import _llm
+            import google.genai as genai
+
+            # Replace nano-graphrag's client so it picks up the new API key
+            _llm.global_gemini_client = genai.Client(api_key=gemini_key)
+        except Exception as e:
+            logger.error(f"Failed to initialize Gemini client: {e}", exc_info=True)
+            raise
+        _gemini_client_fingerprint = fingerprint
+        logger.info(f"Created Gemini client (key len={len(gemini_key)})")
 
 class DashRAGService:
     def __init__(self, working_dir: Path):
@@ -439,45 +493,10 @@ class DashRAGService:
         self.working_dir.mkdir(parents=True, exist_ok=True)
         
         provider_kwargs = resolve_provider_kwargs()
-        logger.info(f"Initializing GraphRAG in {working_dir} with config: {provider_kwargs}")
-        
-        # Explicitly verify and set GEMINI_API_KEY in environment
-        gemini_key = os.getenv("GEMINI_API_KEY", "")
-        logger.info(f"GEMINI_API_KEY status: {'SET (len=' + str(len(gemini_key)) + ')' if gemini_key else 'NOT SET'}")
+        logger.info(f"Initializing GraphRAG in {working_dir} with config: {dict(provider_kwargs)}")
         
-        if not gemini_key and provider_kwargs.get('using_gemini'):
-            # Try to get from settings
-            from ..config import settings
-            if settings.gemini_api_key:
-                os.environ["GEMINI_API_KEY"] = settings.gemini_api_key
-                gemini_key = settings.gemini_api_key
-                logger.info(f"Set GEMINI_API_KEY from settings (len={len(settings.gemini_api_key)})")
-            else:
-                logger.error("GEMINI_API_KEY not found in environment or settings!")
-        
-        # Log first/last chars for debugging (without exposing full key)
-        if gemini_key:
-            logger.info(f"API Key verification: starts with '{gemini_key[:10]}...', ends with '...{gemini_key[-5:]}'")
-        
-        # CRITICAL: Reset the global Gemini client so it picks up the new API key
         if provider_kwargs.get('using_gemini'):
-            try:
-                from nano_graphrag import _llm
-                import google.genai as genai
-                
-                # Force reset both nano-graphrag's client AND google.genai's internal cache
-                _llm.global_gemini_client = None
-                
-                # Manually create and set the client with explicit API key
-                if gemini_key:
-                    _llm.global_gemini_client = genai.Client(api_key=gemini_key)
-                    logger.info(f"Created new Gemini client with explicit API key")
-                else:
-                    logger.error("Cannot create Gemini client - no API key available!")
-                    
-            except Exception as e:
-                logger.error(f"Failed to initialize Gemini client: {e}", exc_info=True)
-                raise
+            _ensure_gemini_client()
         
         try:
             self.rag = GraphRAG(
@@ -495,6 +514,8 @@ class DashRAGService:
             logger.error(f"Failed to initialize GraphRAG: {e}", exc_info=True)
             raise
 
+        self.graph_stamp = _graph_stamp(self.working_dir)
+
     async def insert_texts(self, texts: List[str] | str) -> None:
         """Insert text(s) into the knowledge graph"""
         logger.info(f"Inserting {'single document' if isinstance(texts, str) else f'{len(texts)} documents'} into GraphRAG")
@@ -505,6 +526,10 @@ class DashRAGService:
         except Exception as e:
             logger.error(f"Failed to insert texts into GraphRAG: {e}", exc_info=True)
             raise
+        finally:
+            # ainsert flushes every storage to disk even on failure, so the
+            # in-memory graph matches the files we just wrote.
+            self.graph_stamp = _graph_stamp(self.working_dir)
 
     async def query(self, prompt: str, **qp_kwargs) -> dict[str, Any]:
         """Query the knowledge graph"""
@@ -551,3 +576,37 @@ class DashRAGService:
         except Exception as e:
             logger.error(f"Failed to query GraphRAG: {e}", exc_info=True)
             raise
+
+
+# Loaded GraphRAG instances, keyed by (graph directory, purpose). Building one
+# reads the whole graph, KV stores and vector DB from disk, so reusing it across
+# batches and queries for the same session avoids re-hydrating on every request.
+# Ingest instances are mutated by inserts and callers must hold the session lock
+# while using them; query instances are only read, and are kept separate so a
+# query never sees a graph half-way through an insert. Either kind is reloaded
+# once the graph on disk is newer than the instance.
+_rag_cache: "OrderedDict[tuple[str, str], DashRAGService]" = OrderedDict()
+_rag_cache_lock = Lock()
+
+def get_rag_service(graph_dir: Path, *, for_query: bool = False) -> DashRAGService:
+    """Return the cached DashRAGService for graph_dir, reloading it if the graph changed on disk."""
+    key = (str(graph_dir), "query" if for_query else "ingest")
+    with _rag_cache_lock:
+        svc = _rag_cache.get(key)
+        if svc is not None and svc.graph_stamp == _graph_stamp(graph_dir):
+            _rag_cache.move_to_end(key)
+            return svc
+        _rag_cache.pop(key, None)
+
+    svc = DashRAGService(graph_dir)
+    with _rag_cache_lock:
+        _rag_cache[key] = svc
+        while len(_rag_cache) > settings.rag_cache_size:
+            _rag_cache.popitem(last=False)
+    return svc
+
+def evict_rag_service(graph_dir: Path) -> None:
+    """Drop any cached instances for graph_dir, e.g. when its session is deleted."""
+    with _rag_cache_lock:
+        for purpose in ("ingest", "query"):
+            _rag_cache.pop((str(graph_dir), purpose), None)
@@ -0,0 +1,175 @@
+"""
+Per-session coalescing of knowledge graph inserts.
+
+Background ingest tasks hand their extracted text to this module instead of
+calling DashRAGService.insert_texts directly. Texts that arrive for the same
+session within a short window are flushed together as a single
+insert_texts([...]) call, so nano-graphrag's chunking, entity merge, clustering
+and community report passes run once per batch rather than once per document.
+
+The first task to enqueue into an empty session buffer becomes the flusher: it
+waits until the buffer holds INGEST_BATCH_SIZE texts or INGEST_MAX_WAIT_MS has
+elapsed, takes the session lock, drains everything queued so far and writes the
+resulting document statuses in one commit. Later tasks just enqueue and return.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models import Document, DocStatus
+from ..utils.aio import run_on_graph_loop
+from ..utils.insert_log import error_insert_log
+from ..utils.locks import session_lock
+from .graphrag_service import get_rag_service
+from .progress_tracker import attach_progress_handler, detach_progress_handler
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingIngest:
+    doc_id: int
+    session_id: int
+    text: str
+
+
+@dataclass
+class _SessionBuffer:
+    items: list[PendingIngest] = field(default_factory=list)
+    full: threading.Event = field(default_factory=threading.Event)
+
+
+_BUFFERS: dict[int, _SessionBuffer] = {}
+_LOCK = threading.Lock()
+
+
+def submit_ingest(item: PendingIngest, graph_dir: Path, lock_file: Path) -> None:
+    """
+    Queue extracted text for insertion into the session's knowledge graph.
+
+    Blocks only if the caller is elected to flush the batch; otherwise returns
+    as soon as the text is buffered.
+
+    Args:
+        item: Document id, session id and extracted text
+        graph_dir: Path to session's knowledge graph directory
+        lock_file: Path to session lock file
+    """
+    sid = item.session_id
+    with _LOCK:
+        buf = _BUFFERS.get(sid)
+        is_flusher = buf is None
+        if is_flusher:
+            buf = _BUFFERS[sid] = _SessionBuffer()
+        buf.items.append(item)
+        if len(buf.items) >= settings.ingest_batch_size:
+            buf.full.set()
+
+    if not is_flusher:
+        logger.info(f"Document {item.doc_id} queued for batched insert into session {sid}")
+        return
+
+    buf.full.wait(timeout=settings.ingest_max_wait_ms / 1000)
+    with session_lock(lock_file):
+        # Drain after taking the lock so texts that arrived while a previous
+        # batch held it are folded into this one.
+        with _LOCK:
+            batch = _BUFFERS.pop(sid).items
+        _flush(batch, graph_dir)
+
+
+def _flush(batch: list[PendingIngest], graph_dir: Path) -> None:
+    doc_ids = [p.doc_id for p in batch]
+    logger.info(f"Inserting batch of {len(batch)} document(s) {doc_ids} into {graph_dir}")
+
+    db = SessionLocal()
+    try:
+        progress_handler = attach_progress_handler(doc_ids)
+        error: Exception | None = None
+        try:
+            # Run async GraphRAG operation on the shared GraphRAG loop
+            run_on_graph_loop(get_rag_service(graph_dir).insert_texts([p.text for p in batch]))
+        except Exception as e:
+            error = e
+        finally:
+            # Always remove the progress handler
+            detach_progress_handler(progress_handler)
+
+        docs = db.query(Document).filter(Document.id.in_(doc_ids)).all()
+        for doc in docs:
+            _apply_insert_result(doc, error)
+        db.commit()
+    except Exception as e:
+        logger.error(f"Unexpected error flushing ingest batch {doc_ids}: {str(e)}", exc_info=True)
+        try:
+            db.rollback()
+            for doc in db.query(Document).filter(Document.id.in_(doc_ids)).all():
+                doc.status = DocStatus.error
+                doc.insert_log = f"Unexpected error: {str(e)}"
+            db.commit()
+        except Exception:
+            pass
+    finally:
+        db.close()
+
+
+# nano-graphrag's convert_response_to_json asserts with this message when an
+# LLM response contains no JSON object at all.
+_NO_JSON_ASSERT_PREFIX = "Unable to parse JSON"
+
+
+def _is_llm_json_error(error: BaseException | None) -> bool:
+    """True if error (or anything in its cause/context chain) is an LLM JSON parse failure."""
+    seen: set[int] = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, json.JSONDecodeError):
+            return True
+        if (
+            isinstance(error, AssertionError)
+            and error.args
+            and isinstance(error.args[0], str)
+            and error.args[0].startswith(_NO_JSON_ASSERT_PREFIX)
+        ):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _apply_insert_result(doc: Document, error: Exception | None) -> None:
+    if error is None:
+        doc.status = DocStatus.ready
+        doc.processing_phase = None
+        doc.progress_percent = 100
+
+        # Check if there were any warnings in the log
+        if "incomplete knowledge graph" in (doc.insert_log or "").lower():
+            doc.insert_log = (doc.insert_log or "") + "\n\nWarning: Community reports may be incomplete due to LLM JSON formatting issues."
+
+        logger.info(f"Document {doc.id} successfully inserted into knowledge graph")
+        return
+
+    error_msg = f"GraphRAG insertion failed: {str(error)}"
+
+    # Check if it's a JSON parsing error that we can recover from
+    if _is_llm_json_error(error):
+        logger.warning(f"Document {doc.id} encountered JSON parsing errors during community report generation, but entities may have been extracted")
+        # Mark as ready with a warning note
+        doc.status = DocStatus.ready
+        doc.processing_phase = None
+        doc.progress_percent = 100
+        doc.insert_log = f"Warning: Community reports incomplete due to LLM response formatting issues.\n\nEntities and relationships were successfully extracted, but some high-level summaries may be missing.\n\nOriginal error: {str(error)}"
+        logger.info(f"Document {doc.id} marked as ready with warnings")
+    else:
+        logger.error(f"Document {doc.id}: {error_msg}", exc_info=error)
+        doc.status = DocStatus.error
+        doc.processing_phase = None
+        doc.progress_percent = 0
+        doc.insert_log = error_insert_log(doc.session_id, doc.id, error_msg, error)
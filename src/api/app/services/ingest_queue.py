@@ -0,0 +1,72 @@
+"""
+Dedicated worker pool for document ingestion jobs.
+
+PDF extraction, arXiv downloads and knowledge graph inserts used to run as
+FastAPI BackgroundTasks, which share the server's request threadpool. A burst
+of uploads could take every thread there and stall sync handlers and the
+threadpool hops of /messages/stream. Jobs submitted here run on their own
+fixed-size pool (INGEST_WORKERS threads) instead, so ingest load queues up
+behind itself rather than behind request handling.
+
+Jobs only receive ids and paths, so the call signatures stay compatible with
+moving them to an out-of-process worker later.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.ingest_workers),
+                thread_name_prefix="ingest",
+            )
+        return _executor
+
+
+def _log_job_failure(name: str, fut: Future) -> None:
+    if fut.cancelled():
+        logger.warning(f"Ingest job {name} was cancelled before it ran")
+        return
+    exc = fut.exception()
+    if exc is not None:
+        logger.error(f"Ingest job {name} failed: {exc!r}", exc_info=exc)
+
+
+def enqueue_job(fn: Callable, /, **kwargs) -> Future:
+    """
+    Run an ingestion job on the dedicated worker pool.
+
+    Args:
+        fn: Job function (e.g. process_uploaded_document)
+        **kwargs: Keyword arguments passed to the job
+
+    Returns:
+        Future for the job; failures are also logged when it completes
+    """
+    fut = _get_executor().submit(fn, **kwargs)
+    fut.add_done_callback(lambda f: _log_job_failure(fn.__name__, f))
+    return fut
+
+
+def shutdown_ingest_queue() -> None:
+    """Stop accepting jobs and drop queued ones; running jobs finish in the background."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -6,147 +6,310 @@ log messages and updates document processing progress in real-time.
 """
 
 import logging
+import queue
 import re
-from sqlalchemy.orm import Session as DBSession
+import threading
+import time
+from contextvars import ContextVar
+from typing import Iterable
+from sqlalchemy import bindparam, update
 from ..models import Document, ProcessingPhase
 from ..db import SessionLocal
 
 logger = logging.getLogger(__name__)
 
+# Progress writes are skipped unless the phase changes, the percentage moves by
+# at least this much, or this long has passed since the last commit.
+MIN_PERCENT_STEP = 5
+MIN_COMMIT_INTERVAL_S = 2.0
+
+_TEXT_CHUNKING = ProcessingPhase.text_chunking.value
+_ENTITY_EXTRACTION = ProcessingPhase.entity_extraction.value
+_GRAPH_CLUSTERING = ProcessingPhase.graph_clustering.value
+_COMMUNITY_REPORTS = ProcessingPhase.community_reports.value
+_FINALIZING = ProcessingPhase.finalizing.value
+
+# nano-graphrag log lines that mark progress, with the fields to set and a
+# label for debug logging.
+_PROGRESS_PATTERNS = (
+    (r"\[New Docs\].*inserting \d+ docs",
+     {"processing_phase": _TEXT_CHUNKING, "progress_percent": 20}, "Text chunking phase"),
+    (r"\[New Chunks\].*inserting \d+ chunks",
+     {"processing_phase": _ENTITY_EXTRACTION, "progress_percent": 30}, "Entity extraction phase"),
+    (r"\[Entity Extraction\]",
+     {"processing_phase": _ENTITY_EXTRACTION, "progress_percent": 40}, "Extracting entities"),
+    (r"Processing .*documents with GenKG",
+     {"progress_percent": 50}, "GenKG processing"),
+    (r"Ensuring graph connectivity",
+     {"processing_phase": _GRAPH_CLUSTERING, "progress_percent": 60}, "Graph clustering"),
+    (r"About to merge .*node types",
+     {"progress_percent": 70}, "Merging entities"),
+    (r"GenKG successfully extracted \d+ entities",
+     {"processing_phase": _COMMUNITY_REPORTS, "progress_percent": 75}, "Community reports phase"),
+    (r"\[Community Report\]",
+     {"processing_phase": _COMMUNITY_REPORTS, "progress_percent": 80}, "Generating community reports"),
+    (r"Processing .*connected components for clustering",
+     {"progress_percent": 85}, "Clustering components"),
+    (r"Generating by levels",
+     {"progress_percent": 90}, "Finalizing communities"),
+    (r"Writing graph with",
+     {"processing_phase": _FINALIZING, "progress_percent": 95}, "Writing graph"),
+)
+
+# All patterns joined into one alternation of named groups, so a log line is
+# scanned once and the group that matched (match.lastgroup) picks the entry.
+_PROGRESS_RE = re.compile(
+    "|".join(f"(?P<p{i}>{pattern})" for i, (pattern, _, _) in enumerate(_PROGRESS_PATTERNS)),
+    re.ASCII,
+)
+_PROGRESS_BY_GROUP = {f"p{i}": (updates, label) for i, (_, updates, label) in enumerate(_PROGRESS_PATTERNS)}
+
+# Literals at least one of which appears in every pattern above. Most log
+# lines contain none of them, and this plain alternation rejects those far
+# faster than _PROGRESS_RE, whose .* branches are retried at every offset.
+_PROGRESS_SENTINEL = re.compile(r"\[|Processing|Ensuring|About to merge|GenKG|Generating|Writing")
+
+# Progress is written with UPDATE statements; the SET clause comes from the
+# keys of the parameters passed in, so no row is loaded into a session.
+_UPDATE_PROGRESS = update(Document).where(Document.id == bindparam("doc_id"))
+
+# The writer drains at most this many queued updates before writing, and wakes
+# at least this often while updates are held back by the commit thresholds.
+WRITER_BATCH_SIZE = 100
+WRITER_POLL_S = 0.5
+DETACH_FLUSH_TIMEOUT_S = 5.0
+
+# A handler that keeps failing logs a traceback only for its first error and
+# every this-many after; the rest log just the message.
+ERROR_TRACEBACK_EVERY = 100
+
+
+class _DocProgress:
+    """Progress the writer holds for one document."""
+
+    __slots__ = ("committed", "committed_at", "pending")
+
+    def __init__(self):
+        # Last values written, to skip no-op commits when nano-graphrag
+        # repeats a log line (e.g. per entity-extraction chunk).
+        self.committed: dict = {}
+        self.committed_at = 0.0
+        # Updates seen since the last commit.
+        self.pending: dict = {}
+
+    def should_commit(self) -> bool:
+        """Commit on a phase change, a step of at least MIN_PERCENT_STEP, or after MIN_COMMIT_INTERVAL_S."""
+        if not self.pending:
+            return False
+        if self.pending.get("processing_phase", self.committed.get("processing_phase")) != self.committed.get("processing_phase"):
+            return True
+        last_percent = self.committed.get("progress_percent")
+        percent = self.pending.get("progress_percent", last_percent)
+        if last_percent is None or (percent is not None and abs(percent - last_percent) >= MIN_PERCENT_STEP):
+            return True
+        return percent != last_percent and time.monotonic() - self.committed_at >= MIN_COMMIT_INTERVAL_S
+
+
+class _ProgressWriter:
+    """
+    Single background thread that writes document progress to the database.
+    
+    Handlers only put (doc_id, updates) on a queue, so the thread running
+    nano-graphrag never waits on the database. The writer merges updates per
+    document and writes everything that is due in one transaction, using its
+    own database session.
+    """
+
+    def __init__(self):
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._docs: dict[int, _DocProgress] = {}
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+                self._thread.start()
+
+    def put(self, doc_ids: tuple[int, ...], updates: dict):
+        self._queue.put((doc_ids, updates))
+
+    def flush(self, doc_ids: tuple[int, ...], timeout: float = DETACH_FLUSH_TIMEOUT_S):
+        """Write everything queued for doc_ids so far and stop tracking them."""
+        done = threading.Event()
+        self._queue.put((doc_ids, done))
+        if not done.wait(timeout):
+            logger.warning(f"Timed out flushing progress for docs {list(doc_ids)}")
+
+    def _next_items(self) -> list:
+        # Block until there is work; poll only while updates are held back.
+        timeout = WRITER_POLL_S if any(d.pending for d in self._docs.values()) else None
+        try:
+            items = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(items) < WRITER_BATCH_SIZE:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            flushes = []
+            for doc_ids, payload in self._next_items():
+                if isinstance(payload, threading.Event):
+                    flushes.append((doc_ids, payload))
+                else:
+                    for doc_id in doc_ids:
+                        self._docs.setdefault(doc_id, _DocProgress()).pending.update(payload)
+
+            finished = {doc_id for doc_ids, _ in flushes for doc_id in doc_ids}
+            due = [
+                (doc_id, state) for doc_id, state in self._docs.items()
+                if state.pending and (doc_id in finished or state.should_commit())
+            ]
+            try:
+                self._write(due)
+            except Exception as e:
+                logger.error(f"Error writing progress for docs {[d for d, _ in due]}: {e}", exc_info=True)
+            finally:
+                # Written or not, these updates are dropped rather than retried.
+                for _, state in due:
+                    state.pending.clear()
+            for doc_ids, done in flushes:
+                for doc_id in doc_ids:
+                    self._docs.pop(doc_id, None)
+                done.set()
+
+    def _write(self, due: list[tuple[int, _DocProgress]]):
+        if not due:
+            return
+        # One executemany per distinct set of columns, one commit for all.
+        by_columns: dict[tuple, list[dict]] = {}
+        for doc_id, state in due:
+            by_columns.setdefault(tuple(sorted(state.pending)), []).append({"doc_id": doc_id, **state.pending})
+        with SessionLocal() as db:
+            conn = db.connection()
+            for rows in by_columns.values():
+                conn.execute(_UPDATE_PROGRESS, rows)
+            db.commit()
+        now = time.monotonic()
+        for _, state in due:
+            state.committed.update(state.pending)
+            state.committed_at = now
+
+
+_writer = _ProgressWriter()
+
+_NANO_LOGGER = logging.getLogger("nano-graphrag")
+
+# Attached handlers by document, so detach can be done by id and emit can
+# tell whether its handler has already been detached.
+_handlers_by_doc: dict[int, "DocumentProgressHandler"] = {}
+_handlers_lock = threading.Lock()
+
+# Handler for the insert running in the current context. nano-graphrag logs
+# from the insert's tasks on the shared GraphRAG loop, which inherit the
+# context of the thread that attached the handler.
+_active_handler: ContextVar["DocumentProgressHandler | None"] = ContextVar("active_progress_handler", default=None)
+
 
 class DocumentProgressHandler(logging.Handler):
     """
-    Custom log handler that parses nano-graphrag logs and updates
-    document progress in the database.
+    Custom log handler that parses nano-graphrag logs and queues document
+    progress updates for the background writer.
+    
+    One handler covers an ingest batch: nano-graphrag inserts the batch's
+    texts in a single pass, so each progress line applies to every document
+    in it and is parsed once for all of them.
     """
     
-    def __init__(self, doc_id: int, db: DBSession):
+    def __init__(self, doc_ids: tuple[int, ...]):
         super().__init__()
-        self.doc_id = doc_id
-        self.db = db
+        self.doc_ids = doc_ids
         self.setLevel(logging.INFO)
+        self._errors = 0
         
     def emit(self, record: logging.LogRecord):
         """
-        Parse log messages and update document progress.
+        Parse log messages and queue any progress update they carry.
         """
+        # Never handle this module's own records (e.g. the error below).
+        # Lines logged by concurrent batches carry their own handler and are ignored.
+        if _active_handler.get() is not self or record.name == __name__:
+            return
+        # A thread may still hold this handler just after it was detached.
+        if _handlers_by_doc.get(self.doc_ids[0]) is not self:
+            return
         try:
             msg = record.getMessage()
+            if not _PROGRESS_SENTINEL.search(msg):
+                return
             
-            # Parse different log patterns from nano-graphrag
-            updates = {}
-            
-            if "[New Docs]" in msg:
-                # Document chunking starting
-                match = re.search(r'inserting (\d+) docs', msg)
-                if match:
-                    updates['processing_phase'] = ProcessingPhase.text_chunking.value
-                    updates['progress_percent'] = 20
-                    logger.debug(f"Doc {self.doc_id}: Text chunking phase")
-            
-            elif "[New Chunks]" in msg:
-                # Chunks created, entity extraction starting
-                match = re.search(r'inserting (\d+) chunks', msg)
-                if match:
-                    updates['processing_phase'] = ProcessingPhase.entity_extraction.value
-                    updates['progress_percent'] = 30
-                    logger.debug(f"Doc {self.doc_id}: Entity extraction phase")
-            
-            elif "[Entity Extraction]" in msg:
-                # Entity extraction in progress
-                updates['processing_phase'] = ProcessingPhase.entity_extraction.value
-                updates['progress_percent'] = 40
-                logger.debug(f"Doc {self.doc_id}: Extracting entities")
-            
-            elif "Processing" in msg and "documents with GenKG" in msg:
-                # GenKG processing started
-                updates['progress_percent'] = 50
-                logger.debug(f"Doc {self.doc_id}: GenKG processing")
-            
-            elif "Ensuring graph connectivity" in msg:
-                # Graph clustering phase
-                updates['processing_phase'] = ProcessingPhase.graph_clustering.value
-                updates['progress_percent'] = 60
-                logger.debug(f"Doc {self.doc_id}: Graph clustering")
-            
-            elif "About to merge" in msg and "node types" in msg:
-                # Merging entities
-                updates['progress_percent'] = 70
-                logger.debug(f"Doc {self.doc_id}: Merging entities")
-            
-            elif "GenKG successfully extracted" in msg:
-                # Entities extracted, moving to community reports
-                match = re.search(r'extracted (\d+) entities', msg)
-                if match:
-                    updates['processing_phase'] = ProcessingPhase.community_reports.value
-                    updates['progress_percent'] = 75
-                    logger.debug(f"Doc {self.doc_id}: Community reports phase")
-            
-            elif "[Community Report]" in msg:
-                # Community report generation started
-                updates['processing_phase'] = ProcessingPhase.community_reports.value
-                updates['progress_percent'] = 80
-                logger.debug(f"Doc {self.doc_id}: Generating community reports")
-            
-            elif "Processing" in msg and "connected components for clustering" in msg:
-                # Clustering in progress
-                updates['progress_percent'] = 85
-                logger.debug(f"Doc {self.doc_id}: Clustering components")
-            
-            elif "Generating by levels" in msg:
-                # Final community generation
-                updates['progress_percent'] = 90
-                logger.debug(f"Doc {self.doc_id}: Finalizing communities")
-            
-            elif "Writing graph with" in msg:
-                # Writing final graph
-                updates['processing_phase'] = ProcessingPhase.finalizing.value
-                updates['progress_percent'] = 95
-                logger.debug(f"Doc {self.doc_id}: Writing graph")
-            
-            # Only update if we have changes
-            if updates:
-                doc = self.db.get(Document, self.doc_id)
-                if doc:
-                    for key, value in updates.items():
-                        setattr(doc, key, value)
-                    self.db.commit()
+            # Parse different log patterns from nano-graphrag in a single scan
+            match = _PROGRESS_RE.search(msg)
+            if match:
+                updates, label = _PROGRESS_BY_GROUP[match.lastgroup]
+                logger.debug(f"Docs {list(self.doc_ids)}: {label}")
+                _writer.put(self.doc_ids, updates)
             
         except Exception as e:
-            logger.error(f"Error in progress handler for doc {self.doc_id}: {e}", exc_info=True)
             # Don't raise - we don't want to break the main processing
-            try:
-                self.db.rollback()
-            except:
-                pass
+            self._errors += 1
+            logger.error(
+                f"Error in progress handler for docs {list(self.doc_ids)}: {e!r}",
+                exc_info=self._errors % ERROR_TRACEBACK_EVERY == 1,
+            )
 
 
-def attach_progress_handler(doc_id: int, db: DBSession) -> DocumentProgressHandler:
+def attach_progress_handler(doc_ids: Iterable[int]) -> DocumentProgressHandler:
     """
-    Attach a progress handler to the nano-graphrag logger.
+    Attach a progress handler for an ingest batch to the nano-graphrag logger.
+    
+    Must be called on the thread that submits the insert, before submitting it.
     
     Args:
-        doc_id: Document ID to track
-        db: Database session
+        doc_ids: IDs of the documents inserted together
         
     Returns:
         The created handler (so it can be removed later)
     """
-    handler = DocumentProgressHandler(doc_id, db)
-    nano_logger = logging.getLogger("nano-graphrag")
-    nano_logger.addHandler(handler)
+    _writer.ensure_started()
+    handler = DocumentProgressHandler(tuple(doc_ids))
+    with _handlers_lock:
+        previous = {_handlers_by_doc.get(doc_id) for doc_id in handler.doc_ids} - {None}
+        for doc_id in handler.doc_ids:
+            _handlers_by_doc[doc_id] = handler
+    for old in previous:
+        _NANO_LOGGER.removeHandler(old)
+    _NANO_LOGGER.addHandler(handler)
+    _active_handler.set(handler)
     return handler
 
 
-def detach_progress_handler(handler: DocumentProgressHandler):
+def detach_progress_handler(handler: DocumentProgressHandler | int):
     """
-    Remove a progress handler from the nano-graphrag logger.
+    Remove a progress handler from the nano-graphrag logger and wait until
+    the progress it queued has been written.
     
     Args:
-        handler: The handler to remove
+        handler: The handler to remove, or the ID of a document it tracks
     """
     try:
-        nano_logger = logging.getLogger("nano-graphrag")
-        nano_logger.removeHandler(handler)
+        with _handlers_lock:
+            if isinstance(handler, int):
+                handler = _handlers_by_doc.get(handler)
+            if handler is None:
+                return
+            for doc_id in handler.doc_ids:
+                if _handlers_by_doc.get(doc_id) is handler:
+                    del _handlers_by_doc[doc_id]
+        _NANO_LOGGER.removeHandler(handler)
+        if _active_handler.get() is handler:
+            _active_handler.set(None)
+        _writer.flush(handler.doc_ids)
     except Exception as e:
         logger.error(f"Error removing progress handler: {e}")
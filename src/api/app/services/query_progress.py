@@ -5,6 +5,8 @@ This enables lightweight progress polling for active chat requests.
 
 from __future__ import annotations
 
+import heapq
+import time
 from datetime import datetime, timezone
 from threading import RLock
 from typing import Any
@@ -22,6 +24,32 @@ def _parse_iso_utc(ts: str | None) -> datetime | None:
 _PROGRESS: dict[int, dict[str, Any]] = {}
 _LOCK = RLock()
 
+# Entries are dropped this long after the query finishes (long enough for the
+# client's last polls), or after STALE_TTL_S if it never reports an outcome.
+FINISHED_TTL_S = 600
+STALE_TTL_S = 3600
+
+# (monotonic expiry, message_id) min-heap, so pruning only looks at entries
+# that are actually due. Rescheduling pushes a new pair; the superseded one
+# is recognised by not matching _EXPIRES_AT and skipped when popped.
+_EXPIRY_HEAP: list[tuple[float, int]] = []
+_EXPIRES_AT: dict[int, float] = {}
+
+
+def _schedule_expiry(message_id: int, ttl_s: float) -> None:
+    expires_at = time.monotonic() + ttl_s
+    _EXPIRES_AT[message_id] = expires_at
+    heapq.heappush(_EXPIRY_HEAP, (expires_at, message_id))
+
+
+def _prune_expired() -> None:
+    now = time.monotonic()
+    while _EXPIRY_HEAP and _EXPIRY_HEAP[0][0] <= now:
+        expires_at, message_id = heapq.heappop(_EXPIRY_HEAP)
+        if _EXPIRES_AT.get(message_id) == expires_at:
+            del _EXPIRES_AT[message_id]
+            _PROGRESS.pop(message_id, None)
+
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
@@ -34,6 +62,9 @@ def start_message_progress(
     mode: str,
 ) -> None:
     with _LOCK:
+        _prune_expired()
+        _schedule_expiry(message_id, STALE_TTL_S)
+        now = _now_iso()
         _PROGRESS[message_id] = {
             "message_id": message_id,
             "session_id": session_id,
@@ -46,8 +77,8 @@ def start_message_progress(
             "elapsed_ms": 0,
             "completed_in_ms": None,
             "mode": mode,
-            "started_at": _now_iso(),
-            "updated_at": _now_iso(),
+            "started_at": now,
+            "updated_at": now,
             "error": None,
         }
 
@@ -96,6 +127,7 @@ def complete_message_progress(message_id: int, completed_in_ms: int) -> None:
                 "updated_at": _now_iso(),
             }
         )
+        _schedule_expiry(message_id, FINISHED_TTL_S)
 
 
 def fail_message_progress(message_id: int, elapsed_ms: int, error: str) -> None:
@@ -114,6 +146,7 @@ def fail_message_progress(message_id: int, elapsed_ms: int, error: str) -> None:
                 "updated_at": _now_iso(),
             }
         )
+        _schedule_expiry(message_id, FINISHED_TTL_S)
 
 
 def get_message_progress(message_id: int) -> dict[str, Any] | None:
@@ -141,3 +174,4 @@ def get_message_progress(message_id: int) -> dict[str, Any] | None:
 def clear_message_progress(message_id: int) -> None:
     with _LOCK:
         _PROGRESS.pop(message_id, None)
+        _EXPIRES_AT.pop(message_id, None)
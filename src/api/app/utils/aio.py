@@ -0,0 +1,34 @@
+import asyncio
+import threading
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def _graph_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="graphrag-loop", daemon=True).start()
+        return _loop
+
+
+def run_on_graph_loop(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine on the shared GraphRAG event loop and wait for its result.
+
+    Replacement for asyncio.run() in background tasks. nano-graphrag keeps its
+    LLM clients in process-wide globals, and their HTTP sessions are bound to
+    the loop that first used them, so every GraphRAG coroutine runs on one
+    long-lived loop thread instead of a loop per call or per worker thread.
+    The coroutine runs in a copy of the caller's contextvars.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _graph_loop()).result()
+
+
+async def await_on_graph_loop(coro: Coroutine[Any, Any, T]) -> T:
+    """Async counterpart of run_on_graph_loop() for code already running on another loop."""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _graph_loop()))
@@ -1,34 +1,100 @@
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
 from typing import List, Dict
+import os
+import time
 import arxiv
-import requests
+import httpx
+
+# Search results for identical (query, max_results) pairs are reused for a few
+# minutes, so typeahead-style repeat searches skip the arXiv round-trip.
+SEARCH_CACHE_TTL_SECONDS = 300
+SEARCH_CACHE_MAX_ENTRIES = 1024
+
+_search_cache: "OrderedDict[tuple[str, int], tuple[float, List[Dict]]]" = OrderedDict()
+_search_cache_lock = Lock()
+
+# One pooled client for the per-result PDF size checks, so a search reuses
+# keep-alive connections to arxiv.org instead of a new TLS handshake per HEAD.
+_http = httpx.Client(
+    timeout=5,
+    follow_redirects=True,
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+)
+
+def close_http_client() -> None:
+    _http.close()
+
+def _pdf_size_mb(pdf_url: str) -> float | None:
+    # Get PDF size via HEAD request
+    try:
+        response = _http.head(pdf_url)
+        if response.status_code == 200 and 'content-length' in response.headers:
+            size_bytes = int(response.headers['content-length'])
+            return round(size_bytes / (1024 * 1024), 2)  # Convert to MB
+    except Exception:
+        pass  # If size check fails, just omit it
+    return None
+
+# The HEAD checks are independent round trips, so a search issues them
+# concurrently and waits about as long as the slowest one.
+SIZE_CHECK_CONCURRENCY = 16
+_size_check_pool = ThreadPoolExecutor(max_workers=SIZE_CHECK_CONCURRENCY, thread_name_prefix="arxiv-head")
 
 def search_arxiv(query: str, max_results: int = 5) -> List[Dict]:
     search = arxiv.Search(query=query, max_results=max_results, sort_by=arxiv.SortCriterion.Relevance)
-    out = []
-    for r in search.results():
-        # Get PDF size via HEAD request
-        pdf_size_mb = None
-        try:
-            response = requests.head(r.pdf_url, timeout=5, allow_redirects=True)
-            if response.status_code == 200 and 'content-length' in response.headers:
-                size_bytes = int(response.headers['content-length'])
-                pdf_size_mb = round(size_bytes / (1024 * 1024), 2)  # Convert to MB
-        except Exception:
-            pass  # If size check fails, just omit it
-        
-        out.append({
-            "arxiv_id": r.get_short_id(),
-            "title": r.title,
-            "authors": ", ".join(a.name for a in r.authors),
-            "abstract": r.summary,
-            "published_at": r.published.strftime("%Y-%m-%d") if r.published else None,
-            "pdf_url": r.pdf_url,
-            "pdf_size_mb": pdf_size_mb
-        })
-    return out
+    results = list(search.results())
+    sizes = _size_check_pool.map(_pdf_size_mb, [r.pdf_url for r in results])
+    return [{
+        "arxiv_id": r.get_short_id(),
+        "title": r.title,
+        "authors": ", ".join([a.name for a in r.authors]),
+        "abstract": r.summary,
+        # date.isoformat() gives the same YYYY-MM-DD without strftime's format parsing
+        "published_at": r.published.date().isoformat() if r.published else None,
+        "pdf_url": r.pdf_url,
+        "pdf_size_mb": size_mb,
+    } for r, size_mb in zip(results, sizes)]
+
+def search_arxiv_cached(query: str, max_results: int = 5) -> List[Dict]:
+    key = (" ".join(query.lower().split()), max_results)
+    now = time.monotonic()
+    with _search_cache_lock:
+        hit = _search_cache.get(key)
+        if hit and hit[0] > now:
+            _search_cache.move_to_end(key)
+            return hit[1]
+
+    results = search_arxiv(query, max_results=max_results)
+
+    with _search_cache_lock:
+        _search_cache[key] = (now + SEARCH_CACHE_TTL_SECONDS, results)
+        _search_cache.move_to_end(key)
+        while len(_search_cache) > SEARCH_CACHE_MAX_ENTRIES:
+            _search_cache.popitem(last=False)
+    return results
+
+# Downloads are written in large chunks straight from the socket, so a worker
+# holds at most one chunk of the PDF in memory regardless of its size.
+DOWNLOAD_CHUNK_BYTES = 512 * 1024
+DOWNLOAD_TIMEOUT = httpx.Timeout(5, read=60)
 
 def download_pdf(arxiv_id: str, out_dir) -> str:
     paper = next(arxiv.Search(id_list=[arxiv_id]).results())
-    pdf_path = paper.download_pdf(dirpath=str(out_dir))
+    pdf_path = Path(out_dir) / f"{paper.get_short_id().replace('/', '_')}.pdf"
+    part_path = pdf_path.with_name(pdf_path.name + ".part")
+    try:
+        with _http.stream("GET", paper.pdf_url, timeout=DOWNLOAD_TIMEOUT) as r:
+            r.raise_for_status()
+            with open(part_path, "wb") as f:
+                for chunk in r.iter_bytes(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                    f.write(chunk)
+        # Readers never see a half-written PDF under the final name.
+        os.replace(part_path, pdf_path)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
     return str(pdf_path)
@@ -0,0 +1,50 @@
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Streams must reach the client frame by frame, and archives are already compressed.
+_PASSTHROUGH_TYPES = ("text/event-stream", "application/zip")
+_MARKER = "identity"
+
+
+def _passthrough_headers(message: Message) -> MutableHeaders | None:
+    if message["type"] != "http.response.start":
+        return None
+    headers = MutableHeaders(scope=message)
+    return headers if headers.get("content-type", "").startswith(_PASSTHROUGH_TYPES) else None
+
+
+def _mark_passthrough(app: ASGIApp) -> ASGIApp:
+    async def wrapped(scope: Scope, receive: Receive, send: Send) -> None:
+        async def send_marked(message: Message) -> None:
+            headers = _passthrough_headers(message)
+            if headers is not None:
+                headers.setdefault("content-encoding", _MARKER)
+            await send(message)
+
+        await app(scope, receive, send_marked)
+
+    return wrapped
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that leaves SSE streams and zip downloads uncompressed.
+
+    Pass-through responses are labelled `Content-Encoding: identity` before
+    GZipMiddleware sees them, since it never re-encodes a response that
+    already declares an encoding. The label is removed again on the way out:
+    "identity" is only meaningful in Accept-Encoding.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, compresslevel: int = 9) -> None:
+        super().__init__(_mark_passthrough(app), minimum_size=minimum_size, compresslevel=compresslevel)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async def send_unmarked(message: Message) -> None:
+            headers = _passthrough_headers(message)
+            if headers is not None and headers.get("content-encoding") == _MARKER:
+                del headers["content-encoding"]
+            await send(message)
+
+        await super().__call__(scope, receive, send_unmarked)
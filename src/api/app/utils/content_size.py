@@ -0,0 +1,43 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class ContentSizeLimitMiddleware:
+    """Reject request bodies larger than ``max_bytes`` before any handler parses them.
+
+    A declared Content-Length over the limit is answered with 413 without reading
+    the body. Bodies without one (chunked uploads) are counted as they arrive and
+    cut off with 413 once they pass the limit, so Starlette never spools the rest.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds {self.max_bytes // (1024 * 1024)} MB"
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > self.max_bytes:
+                    await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing as-is.
+                    raise HTTPException(413, detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,50 @@
+import logging
+import traceback
+from pathlib import Path
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _log_path(session_id: int, doc_id: int) -> Path:
+    return settings.data_root / "sessions" / str(session_id) / "logs" / f"{doc_id}.log"
+
+
+# Only the innermost frames are formatted for the row: they name the actual
+# failure, and the full trace is already in the application log via exc_info.
+TRACEBACK_FRAMES = 8
+
+
+def error_insert_log(session_id: int, doc_id: int | None, error_msg: str, exc: BaseException) -> str:
+    """Build the insert_log text for a failed document, capped at INSERT_LOG_MAX_BYTES.
+
+    The traceback is formatted once, here, and limited to the last
+    TRACEBACK_FRAMES frames of each exception in the chain. Oversized logs are
+    written in full to sessions/{sid}/logs/{doc_id}.log and only the error
+    message plus the tail of the traceback is kept in the row.
+    """
+    tb = "".join(traceback.format_exception(exc, limit=-TRACEBACK_FRAMES))
+    full = f"{error_msg}\n\nTraceback:\n{tb}"
+    limit = settings.insert_log_max_bytes
+    if len(full.encode("utf-8")) <= limit:
+        return full
+
+    note = "\n\n[traceback truncated]"
+    if doc_id is not None:
+        path = _log_path(session_id, doc_id)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(full, encoding="utf-8")
+            note = f"\n\n[traceback truncated; full log: {path}]"
+        except OSError as e:
+            logger.warning(f"Could not write full insert log for document {doc_id}: {e}")
+
+    # Keep the message and the innermost frames, which name the actual failure.
+    # The message itself can be huge (e.g. an echoed LLM response), so it gets
+    # at most half the budget.
+    msg = error_msg.encode("utf-8")[: limit // 2].decode("utf-8", errors="ignore")
+    head = f"{msg}\n\nTraceback (last frames):\n...".encode("utf-8")
+    budget = max(limit - len(head) - len(note.encode("utf-8")), 0)
+    tail = tb.encode("utf-8")[-budget:] if budget else b""
+    return (head + tail).decode("utf-8", errors="ignore") + note
@@ -1,14 +1,79 @@
-
+import atexit
+import threading
+from collections import OrderedDict
 from contextlib import contextmanager
 from pathlib import Path
+from typing import IO
 import portalocker
 
+
+class _LockFile:
+    """An open lock file shared by this process's session_lock() holders."""
+
+    __slots__ = ("file", "mutex", "users")
+
+    def __init__(self, path: Path):
+        self.file: IO = open(path, "a+")
+        # flock() does not exclude other threads using the same open file,
+        # so holders in this process queue on this instead.
+        self.mutex = threading.Lock()
+        self.users = 0
+
+
+# Lock files stay open between acquisitions, so taking a session lock costs
+# one flock() instead of open/flock/close. Entries not in use are closed
+# least-recently-used first once there are more than MAX_OPEN_LOCK_FILES.
+MAX_OPEN_LOCK_FILES = 128
+_lock_files: "OrderedDict[Path, _LockFile]" = OrderedDict()
+_lock_files_guard = threading.Lock()
+
+
+def _checkout(lock_file: Path) -> _LockFile:
+    with _lock_files_guard:
+        entry = _lock_files.get(lock_file)
+        if entry is None:
+            lock_file.parent.mkdir(parents=True, exist_ok=True)
+            entry = _lock_files[lock_file] = _LockFile(lock_file)
+            idle = [p for p, e in _lock_files.items() if e.users == 0 and e is not entry]
+            for path in idle[: max(0, len(_lock_files) - MAX_OPEN_LOCK_FILES)]:
+                _lock_files.pop(path).file.close()
+        else:
+            _lock_files.move_to_end(lock_file)
+        entry.users += 1
+        return entry
+
+
+def _checkin(lock_file: Path, entry: _LockFile) -> None:
+    with _lock_files_guard:
+        entry.users -= 1
+        if entry.users == 0 and _lock_files.get(lock_file) is not entry:
+            entry.file.close()
+
+
+def forget_lock_file(lock_file: Path) -> None:
+    """Drop the cached handle for lock_file, e.g. before its directory is removed."""
+    with _lock_files_guard:
+        entry = _lock_files.pop(lock_file, None)
+        if entry is not None and entry.users == 0:
+            entry.file.close()
+
+
+@atexit.register
+def _close_lock_files() -> None:
+    with _lock_files_guard:
+        while _lock_files:
+            _lock_files.popitem()[1].file.close()
+
+
 @contextmanager
 def session_lock(lock_file: Path):
-    lock_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(lock_file, "a+") as f:
-        portalocker.lock(f, portalocker.LOCK_EX)
-        try:
-            yield
-        finally:
-            portalocker.unlock(f)
+    entry = _checkout(lock_file)
+    try:
+        with entry.mutex:
+            portalocker.lock(entry.file, portalocker.LOCK_EX)
+            try:
+                yield
+            finally:
+                portalocker.unlock(entry.file)
+    finally:
+        _checkin(lock_file, entry)
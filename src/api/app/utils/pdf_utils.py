@@ -1,8 +1,19 @@
 
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+from threading import Lock
 from typing import Optional, Tuple, List
+import multiprocessing
+import os
 import fitz  # PyMuPDF
 
+# PyMuPDF holds the GIL for most of get_text(), so concurrent extractions on
+# threads run one at a time. Worker processes let them use separate cores.
+_EXTRACT_WORKERS = min(4, os.cpu_count() or 1)
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = Lock()
+
 def extract_text(pdf_path: Path, max_pages: Optional[int] = None) -> tuple[str, int]:
     text_parts: List[str] = []
     with fitz.open(pdf_path) as doc:
@@ -15,3 +26,56 @@ def extract_text(pdf_path: Path, max_pages: Optional[int] = None) -> tuple[str,
                 text_parts.append(f"\n--- Page {page_num + 1} ---\n")
                 text_parts.append(page_text)
     return ("\n".join(text_parts), pages)
+
+
+def drop_page_cache(path: Path) -> None:
+    """Tell the kernel the file's cached pages won't be needed again soon.
+
+    Once its text is extracted a PDF is only read again on export, so keeping it
+    in the page cache just pushes out hotter pages (SQLite WAL, graph files).
+    No-op where posix_fadvise is unavailable.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the API process has live threads and DB connections.
+            _pool = ProcessPoolExecutor(max_workers=_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def extract_text_in_worker(pdf_path: Path, max_pages: Optional[int] = None) -> tuple[str, int]:
+    """Run extract_text in the shared worker process pool and wait for the result."""
+    global _pool
+    pool = _get_pool()
+    try:
+        result = pool.submit(extract_text, pdf_path, max_pages).result()
+        drop_page_cache(pdf_path)
+        return result
+    except BrokenProcessPool:
+        # A worker crashed (e.g. on a malformed PDF); start a fresh pool next time.
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise
+
+def shutdown_extract_pool() -> None:
+    """Stop the extraction worker processes and drop queued extractions."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, AsyncIterator
+
+import orjson
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+# Comment frame: ignored by EventSource clients but keeps proxies from
+# closing an idle connection while the server is still working.
+_PING = b": ping\n\n"
+
+
+def sse_event(payload: Any) -> bytes:
+    """Frame a JSON payload as an SSE ``data:`` event, encoded straight to bytes."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+async def _with_keepalive(events: AsyncIterator[str | bytes], ping_interval: float) -> AsyncIterator[str | bytes]:
+    it = events.__aiter__()
+    pending = asyncio.ensure_future(it.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({pending}, timeout=ping_interval)
+            if not done:
+                yield _PING
+                continue
+            try:
+                frame = pending.result()
+            except StopAsyncIteration:
+                return
+            yield frame
+            pending = asyncio.ensure_future(it.__anext__())
+    finally:
+        if not pending.done():
+            pending.cancel()
+
+
+def sse_response(events: AsyncIterator[str | bytes], ping_interval: float = 15.0) -> StreamingResponse:
+    """Wrap an async generator of pre-framed SSE events in a streaming response.
+
+    The generator must be ``async`` so Starlette iterates it on the event loop
+    instead of hopping to the threadpool for every frame.
+    """
+    return StreamingResponse(
+        _with_keepalive(events, ping_interval),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
@@ -0,0 +1,38 @@
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+TRASH_MARKER = ".deleted-"
+
+
+def move_to_trash(path: Path) -> Path | None:
+    """Rename path out of the way so it can be removed later.
+
+    The rename is a single syscall on the same filesystem, so callers can
+    return immediately and leave the (possibly slow) recursive delete to
+    purge(). Returns the new location, or None if path did not exist.
+    """
+    target = path.with_name(f"{path.name}{TRASH_MARKER}{uuid.uuid4().hex}")
+    try:
+        os.rename(path, target)
+    except FileNotFoundError:
+        return None
+    return target
+
+
+def purge(path: Path) -> None:
+    """Recursively delete a trashed directory, ignoring errors."""
+    shutil.rmtree(path, ignore_errors=True)
+    logger.info(f"Removed {path}")
+
+
+def sweep_trash(root: Path) -> None:
+    """Delete leftovers from deletions that were interrupted (e.g. by a restart)."""
+    if not root.is_dir():
+        return
+    for path in root.glob(f"*{TRASH_MARKER}*"):
+        purge(path)
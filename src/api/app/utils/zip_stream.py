@@ -0,0 +1,86 @@
+import io
+import os
+import zipfile
+from pathlib import Path
+from typing import Iterator
+
+CHUNK_BYTES = 1 << 20  # 1 MiB
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable sink that collects what ZipFile writes until drained."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+# Top-level directories whose files are already compressed (PDFs carry
+# FlateDecode streams), so deflating them again costs CPU for ~no gain.
+STORED_DIRS = frozenset({"uploads"})
+
+# Graph JSON/GraphML compresses well even at the fastest level.
+DEFLATE_LEVEL = 1
+
+
+def iter_zip(base: Path) -> Iterator[bytes]:
+    """Yield a ZIP archive of everything under base, built as it is sent.
+
+    Nothing is staged on disk. Files under STORED_DIRS (the large PDFs) are
+    copied in CHUNK_BYTES pieces, so at most one chunk of them is held in
+    memory; other files are deflated whole by ZipFile.write and sent once each
+    is done. Because the sink is unseekable, ZipFile writes sizes and CRCs in
+    data descriptors after each entry instead of seeking back to the header.
+    Entries are walked in sorted order so the same tree gives the same archive.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=DEFLATE_LEVEL) as zf:
+        for root, dirs, files in os.walk(base):
+            dirs.sort()
+            for name in sorted(files):
+                path = Path(root) / name
+                arcname = path.relative_to(base).as_posix()
+                if arcname.split("/", 1)[0] not in STORED_DIRS:
+                    zf.write(path, arcname)
+                    yield sink.drain()
+                    continue
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                info.compress_type = zipfile.ZIP_STORED
+                with open(path, "rb") as src, zf.open(info, "w", force_zip64=True) as dst:
+                    while chunk := src.read(CHUNK_BYTES):
+                        dst.write(chunk)
+                        yield sink.drain()
+                yield sink.drain()
+    yield sink.drain()
+
+
+def tree_fingerprint(base: Path) -> tuple[int, int, int]:
+    """Return (file count, total bytes, newest mtime_ns) for the files under base.
+
+    One stat per entry via os.scandir; cheap next to reading the files, and
+    changes whenever a file in the tree is added, removed or rewritten.
+    """
+    count = total = newest = 0
+    stack = [base]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    count += 1
+                    total += st.st_size
+                    newest = max(newest, st.st_mtime_ns)
+    return count, total, newest
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import uuid
+
+import dotenv
+import pytest
+
+# Point the app at a throwaway data root and SQLite file before anything under
+# app/ is imported (settings are read once, at import). A developer's .env must
+# not redirect the tests to a real database, so it is not loaded here.
+_DATA_ROOT = tempfile.mkdtemp(prefix="dashrag-tests-")
+os.environ["DATA_ROOT"] = _DATA_ROOT
+os.environ["DATABASE_URL"] = f"sqlite:///{_DATA_ROOT}/test.db"
+dotenv.load_dotenv = lambda *args, **kwargs: False
+
+
+@pytest.fixture(scope="session")
+def db_tables():
+    """Create the tables in the test database."""
+    from app.db import init_db
+
+    init_db()
+
+
+@pytest.fixture(scope="session")
+def client(db_tables):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def auth_headers(client):
+    email = f"{uuid.uuid4().hex}@example.com"
+    client.post("/auth/register", json={"email": email, "password": "pw"}).raise_for_status()
+    token = client.post("/auth/token", data={"username": email, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def session_id(client, auth_headers):
+    r = client.post("/sessions", json={"title": "Test"}, headers=auth_headers)
+    r.raise_for_status()
+    return r.json()["id"]
+
+
+@pytest.fixture
+def no_ingest(monkeypatch):
+    """Keep uploaded and added documents pending instead of running extraction and the LLM."""
+    from app.routers import documents
+
+    jobs = []
+    monkeypatch.setattr(documents, "enqueue_job", lambda fn, /, **kwargs: jobs.append((fn, kwargs)))
+    return jobs
+
+
+@pytest.fixture
+def make_pdf():
+    """Factory for one-page PDFs; different text gives different bytes."""
+    import fitz
+
+    def make(text: str = "Hello") -> bytes:
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), text)
+        data = doc.tobytes()
+        doc.close()
+        return data
+
+    return make
+
+
+@pytest.fixture
+def set_document_status():
+    from app.db import SessionLocal
+    from app.models import Document
+
+    def set_status(doc_id: int, status) -> None:
+        db = SessionLocal()
+        try:
+            db.get(Document, doc_id).status = status
+            db.commit()
+        finally:
+            db.close()
+
+    return set_status
+
+
+@pytest.fixture
+def upload_pdf(client, auth_headers, session_id, no_ingest, make_pdf, set_document_status):
+    """Upload a PDF to the test session without ingesting it, optionally forcing its status."""
+
+    def upload(data: bytes | None = None, name: str = "paper.pdf", status=None):
+        r = client.post(
+            f"/documents/upload?sid={session_id}",
+            files={"file": (name, make_pdf() if data is None else data, "application/pdf")},
+            headers=auth_headers,
+        )
+        if status is not None:
+            r.raise_for_status()
+            set_document_status(r.json()["id"], status)
+        return r
+
+    return upload
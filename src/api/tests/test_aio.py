@@ -0,0 +1,59 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.aio import await_on_graph_loop, run_on_graph_loop
+
+
+class LoopBoundClient:
+    """Fake LLM client that, like an aiohttp session, only works on the loop that first used it."""
+
+    def __init__(self):
+        self.loop = None
+
+    async def complete(self, prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        if loop is not self.loop:
+            raise RuntimeError("Timeout context manager should be used inside a task")
+        await asyncio.sleep(0)
+        return f"answer to {prompt}"
+
+
+def test_calls_from_different_threads_share_one_loop():
+    client = LoopBoundClient()
+    both_started = threading.Barrier(2)
+
+    def worker(prompt: str) -> tuple[int, str]:
+        both_started.wait(timeout=5)
+        return threading.get_ident(), run_on_graph_loop(client.complete(prompt))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(worker, ["insert", "query"]))
+
+    assert results[0][0] != results[1][0]
+    assert [answer for _, answer in results] == ["answer to insert", "answer to query"]
+
+
+def test_await_from_another_loop_uses_the_graph_loop():
+    client = LoopBoundClient()
+    assert run_on_graph_loop(client.complete("insert")) == "answer to insert"
+
+    # e.g. the streaming chat route, which runs on the server's own loop
+    assert asyncio.run(await_on_graph_loop(client.complete("query"))) == "answer to query"
+
+
+def test_coroutine_sees_caller_context():
+    var = contextvars.ContextVar("var", default=None)
+
+    async def read():
+        return var.get()
+
+    def worker(value: str) -> str:
+        var.set(value)
+        return run_on_graph_loop(read())
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert list(pool.map(worker, ["a", "b"])) == ["a", "b"]
@@ -0,0 +1,29 @@
+from app.models import DocStatus
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def test_json_responses_are_gzipped(client):
+    r = client.get("/openapi.json", headers=GZIP)
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+
+
+def test_progress_stream_is_not_gzipped(client, auth_headers, session_id, upload_pdf):
+    doc_id = upload_pdf(status=DocStatus.ready).json()["id"]
+    r = client.get(
+        f"/documents/progress-stream?sid={session_id}&doc_id={doc_id}",
+        headers={**auth_headers, **GZIP},
+    )
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    assert "content-encoding" not in r.headers
+    assert "data:" in r.text
+
+
+def test_export_is_not_gzipped(client, auth_headers, session_id, upload_pdf):
+    upload_pdf(status=DocStatus.ready)
+    r = client.get(f"/sessions/export?sid={session_id}", headers={**auth_headers, **GZIP})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/zip"
+    assert "content-encoding" not in r.headers
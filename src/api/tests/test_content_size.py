@@ -0,0 +1,38 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.utils.content_size import ContentSizeLimitMiddleware
+
+LIMIT = 1024
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(ContentSizeLimitMiddleware, max_bytes=LIMIT)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    return TestClient(app)
+
+
+def test_body_within_limit_passes():
+    r = _client().post("/echo", content=b"x" * LIMIT)
+    assert r.status_code == 200
+    assert r.json() == {"size": LIMIT}
+
+
+def test_declared_length_over_limit_is_rejected():
+    r = _client().post("/echo", content=b"x" * (LIMIT + 1))
+    assert r.status_code == 413
+
+
+def test_chunked_body_over_limit_is_rejected():
+    def body():
+        for _ in range(4):
+            yield b"x" * (LIMIT // 2)
+
+    r = _client().post("/echo", content=body())
+    assert "content-length" not in r.request.headers
+    assert r.status_code == 413
@@ -0,0 +1,69 @@
+from app.db import SessionLocal
+from app.models import DocStatus
+
+
+def test_identical_upload_reuses_existing_document(upload_pdf, make_pdf, no_ingest):
+    pdf = make_pdf("same bytes")
+    first = upload_pdf(pdf)
+    assert first.status_code == 202, first.text
+    second = upload_pdf(pdf, name="renamed.pdf")
+    assert second.status_code == 202, second.text
+
+    assert second.json()["id"] == first.json()["id"]
+    assert second.json()["cached"] is True
+    assert len(no_ingest) == 1
+
+    other = upload_pdf(make_pdf("different bytes"))
+    assert other.json()["id"] != first.json()["id"]
+    assert "cached" not in other.json()
+
+
+def test_failed_upload_is_not_reused(upload_pdf, make_pdf, no_ingest):
+    pdf = make_pdf("retry me")
+    first = upload_pdf(pdf, status=DocStatus.error).json()
+
+    retry = upload_pdf(pdf).json()
+    assert retry["id"] != first["id"]
+    assert "cached" not in retry
+    assert len(no_ingest) == 2
+
+
+def _add_arxiv(client, headers, sid, arxiv_id="1706.03762"):
+    return client.post(f"/documents/add-arxiv?sid={sid}", json={"arxiv_id": arxiv_id}, headers=headers)
+
+
+def test_insert_arxiv_document_skips_existing_paper(client, auth_headers, session_id):
+    from app.routers.documents import _insert_arxiv_document
+
+    db = SessionLocal()
+    try:
+        doc_id = _insert_arxiv_document(db, session_id, "2101.00001")
+        db.commit()
+        assert doc_id is not None
+        assert _insert_arxiv_document(db, session_id, "2101.00001") is None
+        assert _insert_arxiv_document(db, session_id, "2101.00002") not in (None, doc_id)
+        db.rollback()
+    finally:
+        db.close()
+
+
+def test_adding_same_arxiv_paper_twice_is_cached(client, auth_headers, session_id, no_ingest):
+    first = _add_arxiv(client, auth_headers, session_id)
+    assert first.status_code == 202, first.text
+    second = _add_arxiv(client, auth_headers, session_id)
+    assert second.status_code == 202, second.text
+
+    assert second.json()["id"] == first.json()["id"]
+    assert second.json()["cached"] is True
+    assert len(no_ingest) == 1
+
+
+def test_failed_arxiv_paper_is_retried_in_place(client, auth_headers, session_id, no_ingest, set_document_status):
+    first = _add_arxiv(client, auth_headers, session_id).json()
+    set_document_status(first["id"], DocStatus.error)
+
+    retry = _add_arxiv(client, auth_headers, session_id).json()
+    assert retry["id"] == first["id"]
+    assert retry["status"] == DocStatus.pending.value
+    assert "cached" not in retry
+    assert len(no_ingest) == 2
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models import Document, DocSource, DocStatus, Session as SessionModel, User
+from app.services import ingest_batcher
+from app.services.ingest_batcher import PendingIngest, _is_llm_json_error, submit_ingest
+
+pytestmark = pytest.mark.usefixtures("db_tables")
+
+
+class FakeRag:
+    def __init__(self, error: Exception | None = None):
+        self.calls: list[list[str]] = []
+        self.error = error
+
+    async def insert_texts(self, texts):
+        self.calls.append(list(texts))
+        if self.error is not None:
+            raise self.error
+
+
+def _make_docs(n: int) -> tuple[int, list[int]]:
+    db = SessionLocal()
+    try:
+        user = User(email=f"{uuid.uuid4().hex}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        s = SessionModel(user_id=user.id, title="t", graph_dir="")
+        db.add(s)
+        db.flush()
+        docs = [Document(session_id=s.id, source_type=DocSource.upload, status=DocStatus.inserting) for _ in range(n)]
+        db.add_all(docs)
+        db.commit()
+        return s.id, [d.id for d in docs]
+    finally:
+        db.close()
+
+
+def _statuses(doc_ids: list[int]) -> list[DocStatus]:
+    db = SessionLocal()
+    try:
+        return [db.get(Document, doc_id).status for doc_id in doc_ids]
+    finally:
+        db.close()
+
+
+def _submit_pair(monkeypatch, rag: FakeRag) -> list[int]:
+    """Submit two documents for one session so that they land in a single flush."""
+    monkeypatch.setattr(ingest_batcher, "get_rag_service", lambda graph_dir: rag)
+    # The second submission fills the batch, so the flusher never waits out the timer.
+    monkeypatch.setattr(ingest_batcher, "settings", SimpleNamespace(ingest_batch_size=2, ingest_max_wait_ms=10_000))
+    sid, doc_ids = _make_docs(2)
+    root = Path(settings.data_root) / "sessions" / str(sid)
+    args = (root / "graph", root / ".lock")
+
+    flusher = threading.Thread(target=submit_ingest, args=(PendingIngest(doc_ids[0], sid, "first"), *args))
+    flusher.start()
+    while sid not in ingest_batcher._BUFFERS:
+        time.sleep(0.001)
+    submit_ingest(PendingIngest(doc_ids[1], sid, "second"), *args)
+    flusher.join(timeout=10)
+    assert not flusher.is_alive()
+    return doc_ids
+
+
+def test_submissions_in_one_window_share_one_insert(monkeypatch):
+    rag = FakeRag()
+    doc_ids = _submit_pair(monkeypatch, rag)
+    assert rag.calls == [["first", "second"]]
+    assert _statuses(doc_ids) == [DocStatus.ready, DocStatus.ready]
+
+
+def test_failed_insert_marks_every_document_in_batch(monkeypatch):
+    rag = FakeRag(error=RuntimeError("graph write failed"))
+    doc_ids = _submit_pair(monkeypatch, rag)
+    assert len(rag.calls) == 1
+    assert _statuses(doc_ids) == [DocStatus.error, DocStatus.error]
+
+
+def test_llm_json_errors_are_recognised():
+    assert _is_llm_json_error(json.JSONDecodeError("Expecting value", "", 0))
+    assert _is_llm_json_error(AssertionError("Unable to parse JSON from response: ..."))
+
+    try:
+        try:
+            json.loads("not json")
+        except json.JSONDecodeError as e:
+            raise RuntimeError("community report failed") from e
+    except RuntimeError as wrapped:
+        assert _is_llm_json_error(wrapped)
+
+    assert not _is_llm_json_error(AssertionError("some other assertion"))
+    assert not _is_llm_json_error(RuntimeError("rate limited"))
+    assert not _is_llm_json_error(None)
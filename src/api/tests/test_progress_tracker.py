@@ -0,0 +1,36 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from app.services import progress_tracker
+from app.utils.aio import run_on_graph_loop
+
+_NANO_LOGGER = logging.getLogger("nano-graphrag")
+
+
+def test_progress_is_attributed_to_the_submitting_batch(monkeypatch, caplog):
+    caplog.set_level(logging.INFO, logger=_NANO_LOGGER.name)
+    puts = []
+    monkeypatch.setattr(
+        progress_tracker,
+        "_writer",
+        SimpleNamespace(ensure_started=lambda: None, put=lambda ids, updates: puts.append(ids), flush=lambda ids: None),
+    )
+    both_attached = threading.Barrier(2)
+
+    async def insert(n_docs: int):
+        _NANO_LOGGER.info(f"[New Docs] inserting {n_docs} docs")
+
+    def ingest(doc_ids: list[int]):
+        handler = progress_tracker.attach_progress_handler(doc_ids)
+        try:
+            both_attached.wait(timeout=5)
+            run_on_graph_loop(insert(len(doc_ids)))
+        finally:
+            progress_tracker.detach_progress_handler(handler)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(ingest, [[101], [102, 103]]))
+
+    assert sorted(puts) == [(101,), (102, 103)]
@@ -0,0 +1,52 @@
+import io
+import os
+import zipfile
+
+from app.config import settings
+from app.utils.zip_stream import iter_zip
+
+
+def _open_zip(chunks) -> zipfile.ZipFile:
+    return zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+
+def test_iter_zip_is_valid_sorted_and_stores_uploads(tmp_path):
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "graph").mkdir()
+    (tmp_path / "uploads" / "b.pdf").write_bytes(os.urandom(3 * 1024 * 1024))
+    (tmp_path / "uploads" / "a.pdf").write_bytes(b"%PDF-1.4 small")
+    (tmp_path / "graph" / "graph.graphml").write_text("<graphml>" + "<node/>" * 5000 + "</graphml>")
+    (tmp_path / "graph" / "kv_store.json").write_text('{"k": "v"}' * 5000)
+
+    zf = _open_zip(iter_zip(tmp_path))
+    assert zf.testzip() is None
+    names = zf.namelist()
+    assert names == ["graph/graph.graphml", "graph/kv_store.json", "uploads/a.pdf", "uploads/b.pdf"]
+    for info in zf.infolist():
+        expected = zipfile.ZIP_STORED if info.filename.startswith("uploads/") else zipfile.ZIP_DEFLATED
+        assert info.compress_type == expected, info.filename
+    assert zf.read("uploads/b.pdf") == (tmp_path / "uploads" / "b.pdf").read_bytes()
+
+
+def test_export_revalidates_with_etag(client, auth_headers, session_id, upload_pdf):
+    r = upload_pdf()
+    assert r.status_code == 202, r.text
+    graph_dir = settings.data_root / "sessions" / str(session_id) / "graph"
+    (graph_dir / "graph.graphml").write_text("<graphml/>")
+
+    r = client.get(f"/sessions/export?sid={session_id}", headers=auth_headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/zip"
+    zf = _open_zip([r.content])
+    assert zf.testzip() is None
+    assert "graph/graph.graphml" in zf.namelist()
+    etag = r.headers["etag"]
+
+    r = client.get(f"/sessions/export?sid={session_id}", headers={**auth_headers, "If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+
+    (graph_dir / "community_reports.json").write_text("{}")
+    r = client.get(f"/sessions/export?sid={session_id}", headers={**auth_headers, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag